@@ -9,10 +9,15 @@ from api.config import get_settings
 settings = get_settings()
 
 # Create engine
+# query_cache_size: SQLAlchemy caches the compiled SQL per statement shape, so the
+# repeated ORM lookups (user by username, annotation by id, status counters,
+# activity log inserts) skip re-compilation on every request. psycopg2 has no
+# server-side prepared statement cache, so this is the reusable part.
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
-    echo=settings.debug
+    echo=settings.debug,
+    query_cache_size=settings.db_query_cache_size
 )
 
 # Session factory
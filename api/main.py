@@ -3,7 +3,9 @@ Main FastAPI Application
 Training Platform API Backend
 """
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from api.routers import auth, metrics, conversations, annotations, export
 from api.database.connection import engine, Base
 import os
@@ -12,7 +14,10 @@ import os
 Base.metadata.create_all(bind=engine)
 
 # Create FastAPI app
+# ORJSONResponse: orjson serializes the dashboard/conversation payloads
+# (datetimes, floats, nested lists) several times faster than json
 app = FastAPI(
+    default_response_class=ORJSONResponse,
     title="RASA Training Platform API",
     description="API Backend for RASA Training Platform",
     version="1.0.0",
@@ -29,6 +34,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (conversation lists/details, CSV exports) for
+# clients sending Accept-Encoding: gzip, which requests does by default
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(metrics.router)
@@ -1,8 +1,8 @@
 """
 Conversations endpoints for viewing and managing conversation history
 """
-from fastapi import APIRouter, Depends, Query, HTTPException, Response
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Body, Depends, Query, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from api.database.connection import get_db
 from api.dependencies import get_current_user
@@ -10,7 +10,9 @@ from api.schemas.db_models import PlatformUser
 from api.services.conversation_service import (
     get_conversations_list,
     get_conversation_detail,
+    get_conversation_details_batch,
     flag_conversation,
+    flag_conversations_bulk,
     get_available_intents,
     export_conversations_csv
 )
@@ -20,12 +22,30 @@ from api.models.conversations import (
     ConversationFlagRequest,
     ConversationFlagResponse
 )
-from typing import Optional, List
+from typing import Dict, Iterable, Iterator, Optional, List
 import csv
 import io
 
 router = APIRouter(prefix="/api/v1/conversations", tags=["Conversations"])
 
+CSV_EXPORT_FIELDS = ["sender_id", "created_at", "message_count", "primary_intent", "avg_confidence", "active"]
+
+
+def _iter_csv(rows: Iterable[dict], fieldnames: List[str], chunk_size: int = 500) -> Iterator[str]:
+    """Encode rows as CSV text, yielding one chunk per chunk_size rows"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % chunk_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    yield output.getvalue()
+
 
 @router.get("", response_model=ConversationList)
 def list_conversations(
@@ -38,6 +58,9 @@ def list_conversations(
     confidence_max: Optional[float] = Query(None, ge=0, le=1, description="Maximum confidence (0-1)"),
     sender_id: Optional[str] = Query(None, description="Filter by sender ID"),
     search: Optional[str] = Query(None, description="Text search in messages"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page)"),
+    fields: Optional[str] = Query(None, description="Comma-separated item fields to return (default: all)"),
+    last_message_maxlen: int = Query(100, ge=1, le=2000, description="Max characters of last_message"),
     db: Session = Depends(get_db),
     current_user: PlatformUser = Depends(get_current_user)
 ):
@@ -51,6 +74,8 @@ def list_conversations(
     - **sender_id**: Filter by specific user
     - **search**: Search text in messages
     - **page/limit**: Pagination controls
+    - **cursor**: Seek to the page after a previous response's `next_cursor` (avoids OFFSET on deep pages)
+    - **fields**: Return only these item fields (smaller payload; unknown names are ignored)
     """
     try:
         result = get_conversations_list(
@@ -63,9 +88,17 @@ def list_conversations(
             confidence_min=confidence_min,
             confidence_max=confidence_max,
             sender_id=sender_id,
-            search=search
+            search=search,
+            cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            last_message_maxlen=last_message_maxlen
         )
+        # Projected items don't match the full ConversationList item model
+        if fields:
+            return ORJSONResponse(result)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
 
@@ -87,6 +120,29 @@ def list_available_intents(
         raise HTTPException(status_code=500, detail=f"Error retrieving intents: {str(e)}")
 
 
+@router.get("/batch", response_model=Dict[str, ConversationDetail])
+def get_conversations_batch(
+    sender_ids: str = Query(..., description="Comma-separated sender IDs (max 200)"),
+    db: Session = Depends(get_db),
+    current_user: PlatformUser = Depends(get_current_user)
+):
+    """
+    Get detailed views of several conversations in one request
+
+    Same payload as the single-conversation endpoint, keyed by sender_id.
+    Lets the UI load the details of a whole page in one round trip.
+    Unknown sender IDs are omitted from the result.
+    """
+    ids = list(dict.fromkeys(s.strip() for s in sender_ids.split(",") if s.strip()))
+    if len(ids) > 200:
+        raise HTTPException(status_code=400, detail="At most 200 sender IDs per request")
+
+    try:
+        return get_conversation_details_batch(db, ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
+
+
 @router.get("/{sender_id}", response_model=ConversationDetail)
 def get_conversation(
     sender_id: str,
@@ -158,6 +214,46 @@ def flag_conversation_for_review(
         raise HTTPException(status_code=500, detail=f"Error flagging conversation: {str(e)}")
 
 
+@router.post("/flag")
+def flag_conversations_for_review(
+    sender_ids: List[str] = Body(..., embed=True, min_length=1, max_length=1000),
+    reason: Optional[str] = Body(None, embed=True),
+    priority: str = Body("normal", embed=True),
+    db: Session = Depends(get_db),
+    current_user: PlatformUser = Depends(get_current_user)
+):
+    """
+    Flag several conversations for manual review in one request
+
+    Same semantics as flagging a single conversation; unknown sender IDs are
+    reported in `not_found` instead of failing the whole batch.
+    Requires at least qa_analyst role (level 3).
+    """
+    role_levels = {
+        "viewer": 1,
+        "developer": 2,
+        "qa_analyst": 3,
+        "qa_lead": 4,
+        "admin": 5
+    }
+
+    if role_levels.get(current_user.role, 0) < 3:
+        raise HTTPException(
+            status_code=403,
+            detail="Insufficient permissions. Requires qa_analyst role or higher."
+        )
+
+    try:
+        return flag_conversations_bulk(
+            db=db,
+            sender_ids=sender_ids,
+            reason=reason,
+            priority=priority
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error flagging conversations: {str(e)}")
+
+
 @router.get("/export/csv")
 def export_conversations(
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
@@ -181,19 +277,8 @@ def export_conversations(
             intents=intents
         )
 
-        # Create CSV in memory
-        output = io.StringIO()
-        if data:
-            fieldnames = ["sender_id", "created_at", "message_count", "primary_intent", "avg_confidence", "active"]
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(data)
-
-        # Prepare response
-        output.seek(0)
-
         return StreamingResponse(
-            iter([output.getvalue()]),
+            _iter_csv(data, CSV_EXPORT_FIELDS),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=conversations_export_{date_from or 'all'}_{date_to or 'all'}.csv"
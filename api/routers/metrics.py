@@ -11,16 +11,45 @@ from api.services.metrics_service import (
     get_conversations_timeline,
     get_intent_distribution,
     get_hourly_heatmap,
-    get_success_rate_funnel
+    get_success_rate_funnel,
+    make_window
 )
 from typing import Dict, Any, List
 
 router = APIRouter(prefix="/api/v1/metrics", tags=["Metrics"])
 
 
+@router.get("/dashboard", response_model=Dict[str, Any])
+def get_dashboard(
+    days: int = Query(7, ge=1, le=365, description="Number of days to look back"),
+    timeline_days: int = Query(30, ge=1, le=365, description="Number of days for the timeline"),
+    exact: bool = Query(False, description="Scan raw events instead of the daily rollup"),
+    db: Session = Depends(get_db),
+    current_user: PlatformUser = Depends(get_current_user)
+):
+    """
+    Get every dashboard metric in one call
+
+    Returns summary, timeline, heatmap and funnel, same payloads as the
+    individual endpoints. The intent distribution is not included: the
+    summary's top_intents already covers the dashboard's top 5.
+
+    The summary's event stats come from the daily rollup unless
+    `exact=true` (see `/summary`).
+    """
+    window = make_window(days)
+    return {
+        "summary": get_summary_metrics(db, window, exact=exact),
+        "timeline": get_conversations_timeline(db, make_window(timeline_days)),
+        "heatmap": get_hourly_heatmap(db, window),
+        "funnel": get_success_rate_funnel(db, window)
+    }
+
+
 @router.get("/summary", response_model=Dict[str, Any])
 def get_summary(
     days: int = Query(7, ge=1, le=365, description="Number of days to look back"),
+    exact: bool = Query(False, description="Scan raw events instead of the daily rollup"),
     db: Session = Depends(get_db),
     current_user: PlatformUser = Depends(get_current_user)
 ):
@@ -28,8 +57,14 @@ def get_summary(
     Get summary metrics for dashboard
 
     Returns key metrics like total conversations, avg confidence, top intents, etc.
+
+    By default the event stats (intents, confidence, entities, top intents)
+    are read from the daily rollup, so the window covers whole Guatemala
+    days starting at the day `days` ago. `exact=true` scans events for the
+    rolling window (now - days) instead. Both count only user events with
+    a detected intent.
     """
-    return get_summary_metrics(db, days)
+    return get_summary_metrics(db, make_window(days), exact=exact)
 
 
 @router.get("/timeline", response_model=List[Dict[str, Any]])
@@ -43,12 +78,13 @@ def get_timeline(
 
     Returns daily conversation counts for the specified period.
     """
-    return get_conversations_timeline(db, days)
+    return get_conversations_timeline(db, make_window(days))
 
 
 @router.get("/intents", response_model=List[Dict[str, Any]])
 def get_intents(
     days: int = Query(7, ge=1, le=365, description="Number of days"),
+    exact: bool = Query(False, description="Scan raw events instead of the daily rollup"),
     db: Session = Depends(get_db),
     current_user: PlatformUser = Depends(get_current_user)
 ):
@@ -56,11 +92,14 @@ def get_intents(
     Get intent distribution
 
     Returns intent counts and average confidence scores.
+
+    By default read from the daily rollup (whole Guatemala days starting at
+    the day `days` ago); `exact=true` scans events for the rolling window.
     """
-    return get_intent_distribution(db, days)
+    return get_intent_distribution(db, make_window(days), exact=exact)
 
 
-@router.get("/heatmap", response_model=List[Dict[str, Any]])
+@router.get("/heatmap", response_model=Dict[str, Any])
 def get_heatmap(
     days: int = Query(7, ge=1, le=365, description="Number of days"),
     db: Session = Depends(get_db),
@@ -69,9 +108,9 @@ def get_heatmap(
     """
     Get hourly usage heatmap
 
-    Returns conversation counts by day of week and hour.
+    Returns a 7x24 matrix of conversation counts (day of week x hour).
     """
-    return get_hourly_heatmap(db, days)
+    return get_hourly_heatmap(db, make_window(days))
 
 
 @router.get("/funnel", response_model=Dict[str, Any])
@@ -85,4 +124,4 @@ def get_funnel(
 
     Returns funnel data showing conversation progression from start to resolution.
     """
-    return get_success_rate_funnel(db, days)
+    return get_success_rate_funnel(db, make_window(days))
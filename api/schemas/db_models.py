@@ -1,7 +1,8 @@
 """
 SQLAlchemy Database Models
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from api.database.connection import Base
 
@@ -36,9 +37,9 @@ class Annotation(Base):
     corrected_intent = Column(String(100), index=True)
     original_confidence = Column(Float)
     
-    # Entity annotations
-    original_entities = Column(JSON, default=[])
-    corrected_entities = Column(JSON, default=[])
+    # Entity annotations (JSONB + GIN para consultas @>)
+    original_entities = Column(JSONB, default=[])
+    corrected_entities = Column(JSONB, default=[])
     
     # Metadata
     annotation_type = Column(String(20))
@@ -59,6 +60,13 @@ class Annotation(Base):
     # Training tracking
     included_in_training_job = Column(Integer, ForeignKey("training_jobs.id", ondelete="SET NULL"))
 
+    __table_args__ = (
+        Index('idx_annotations_original_entities_gin', 'original_entities',
+              postgresql_using='gin', postgresql_ops={'original_entities': 'jsonb_path_ops'}),
+        Index('idx_annotations_corrected_entities_gin', 'corrected_entities',
+              postgresql_using='gin', postgresql_ops={'corrected_entities': 'jsonb_path_ops'}),
+    )
+
 
 class TrainingJob(Base):
     """Training jobs table"""
@@ -80,13 +88,13 @@ class TrainingJob(Base):
     model_path = Column(Text)
     
     # Training configuration snapshot
-    config_snapshot = Column(JSON)
-    domain_snapshot = Column(JSON)
+    config_snapshot = Column(JSONB)
+    domain_snapshot = Column(JSONB)
     nlu_examples_count = Column(Integer)
     stories_count = Column(Integer)
     
     # Metrics
-    metrics = Column(JSON)
+    metrics = Column(JSONB)
     
     # Logs
     logs = Column(Text)
@@ -152,7 +160,7 @@ class ActivityLog(Base):
     entity_id = Column(Integer)
     
     # Details
-    details = Column(JSON, default={})
+    details = Column(JSONB, default={})
     
     # Request info
     ip_address = Column(String(45))
@@ -7,8 +7,8 @@ Implements CRUD operations and approval workflow for QA team.
 
 from datetime import datetime
 from typing import Optional, List, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func
 from fastapi import HTTPException, status
 
 from api.schemas.db_models import Annotation, PlatformUser
@@ -155,9 +155,9 @@ def create_annotation(
         annotated_by=user_id
     )
 
+    # Flush to obtain the id, then log and commit both rows together
     db.add(db_annotation)
-    db.commit()
-    db.refresh(db_annotation)
+    db.flush()
 
     # Log activity
     log_activity(
@@ -171,9 +171,12 @@ def create_annotation(
             "conversation_id": annotation.conversation_id,
             "annotation_type": annotation.annotation_type,
             "corrected_intent": annotation.corrected_intent
-        }
+        },
+        commit=False
     )
 
+    db.commit()
+
     return db_annotation
 
 
@@ -193,33 +196,47 @@ def get_annotations(
     Returns:
         Tuple of (list of annotations, total count)
     """
-    # Base query with joins for usernames
-    query = db.query(
-        Annotation,
-        PlatformUser.username.label('annotated_by_username')
-    ).outerjoin(
-        PlatformUser,
-        Annotation.annotated_by == PlatformUser.id
-    )
+    # Aliases so approver/reviewer usernames come from the same query
+    approver = aliased(PlatformUser)
+    reviewer = aliased(PlatformUser)
 
     # Apply filters
+    criteria = []
+
     if filters.status:
-        query = query.filter(Annotation.status == filters.status)
+        criteria.append(Annotation.status == filters.status)
 
     if filters.conversation_id:
-        query = query.filter(Annotation.conversation_id == filters.conversation_id)
+        criteria.append(Annotation.conversation_id == filters.conversation_id)
 
     if filters.intent:
-        query = query.filter(Annotation.corrected_intent == filters.intent)
+        criteria.append(Annotation.corrected_intent == filters.intent)
 
     if filters.annotated_by:
-        query = query.filter(Annotation.annotated_by == filters.annotated_by)
+        criteria.append(Annotation.annotated_by == filters.annotated_by)
 
     if filters.approved_by:
-        query = query.filter(Annotation.approved_by == filters.approved_by)
+        criteria.append(Annotation.approved_by == filters.approved_by)
+
+    # Get total count before pagination (only the id column is needed)
+    total = db.query(func.count(Annotation.id)).filter(*criteria).scalar() or 0
 
-    # Get total count before pagination
-    total = query.count()
+    # Base query with joins for usernames (only the username column of each user)
+    query = db.query(
+        Annotation,
+        PlatformUser.username.label('annotated_by_username'),
+        approver.username.label('approved_by_username'),
+        reviewer.username.label('reviewed_by_username')
+    ).outerjoin(
+        PlatformUser,
+        Annotation.annotated_by == PlatformUser.id
+    ).outerjoin(
+        approver,
+        Annotation.approved_by == approver.id
+    ).outerjoin(
+        reviewer,
+        Annotation.reviewed_by == reviewer.id
+    ).filter(*criteria)
 
     # Apply ordering (newest first)
     query = query.order_by(Annotation.annotated_at.desc())
@@ -233,23 +250,11 @@ def get_annotations(
 
     # Build annotation objects with joined data
     annotations = []
-    for annotation, annotated_by_username in results:
-        # Attach username as attribute (will be used in response)
+    for annotation, annotated_by_username, approved_by_username, reviewed_by_username in results:
+        # Attach usernames as attributes (will be used in response)
         annotation.annotated_by_username = annotated_by_username
-
-        # Get approver username if exists
-        if annotation.approved_by:
-            approver = db.query(PlatformUser).filter(PlatformUser.id == annotation.approved_by).first()
-            annotation.approved_by_username = approver.username if approver else None
-        else:
-            annotation.approved_by_username = None
-
-        # Get reviewer username if exists
-        if annotation.reviewed_by:
-            reviewer = db.query(PlatformUser).filter(PlatformUser.id == annotation.reviewed_by).first()
-            annotation.reviewed_by_username = reviewer.username if reviewer else None
-        else:
-            annotation.reviewed_by_username = None
+        annotation.approved_by_username = approved_by_username
+        annotation.reviewed_by_username = reviewed_by_username
 
         annotations.append(annotation)
 
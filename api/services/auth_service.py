@@ -4,8 +4,8 @@ Authentication service
 from datetime import datetime
 from sqlalchemy.orm import Session
 from api.schemas.db_models import PlatformUser, ActivityLog
-from api.models.auth import UserCreate, User
-from api.utils.security import get_password_hash, verify_password, create_access_token
+from api.models.auth import UserCreate
+from api.utils.security import get_password_hash, verify_password, password_needs_rehash, create_access_token
 from typing import Optional
 
 
@@ -68,6 +68,10 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Pla
     if not verify_password(password, user.password_hash):
         return None
     
+    # Upgrade legacy bcrypt hashes to argon2id on successful login
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = get_password_hash(password)
+    
     # Update last login
     user.last_login = datetime.utcnow()
     db.commit()
@@ -108,9 +112,14 @@ def log_activity(
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None,
     success: bool = True,
-    error_message: Optional[str] = None
+    error_message: Optional[str] = None,
+    commit: bool = True
 ):
-    """Log user activity"""
+    """
+    Log user activity
+
+    Pass commit=False to stage the entry in the caller's transaction.
+    """
     activity = ActivityLog(
         user_id=user_id,
         username=username,
@@ -125,4 +134,5 @@ def log_activity(
     )
     
     db.add(activity)
-    db.commit()
+    if commit:
+        db.commit()
@@ -2,15 +2,72 @@
 Conversation service for managing and retrieving conversation data
 """
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+from itertools import groupby
+from statistics import fmean
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+import base64
 import json
 import math
-import pytz
+import threading
+import time
+from api.config import get_settings
+
+settings = get_settings()
 
 # Timezone de Guatemala
-GUATEMALA_TZ = pytz.timezone('America/Guatemala')
+GUATEMALA_TZ = ZoneInfo('America/Guatemala')
+
+# Rows fetched per round trip when streaming the CSV export
+EXPORT_FETCH_SIZE = 500
+
+# In-process TTL cache for get_available_intents: (expires_at, intents)
+_available_intents_cache: Optional[Tuple[float, List[str]]] = None
+_available_intents_lock = threading.Lock()
+
+# Per-sender aggregates over user events. Same definition as the
+# conversation_stats_mv materialized view (database/init-platform-tables.sql).
+CONVERSATION_STATS_SQL = """
+    SELECT
+        e.sender_id,
+        COUNT(*) as msg_count,
+        MAX(e.timestamp) as last_timestamp,
+        AVG(e.intent_confidence) as avg_conf,
+        MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent,
+        MAX(CASE WHEN e.type_name = 'user' THEN e.user_text END) as last_user_msg
+    FROM events e
+    WHERE e.type_name = 'user'
+    GROUP BY e.sender_id
+"""
+
+
+def _conversation_stats_cte() -> str:
+    """
+    Build the conversation_stats CTE
+
+    Reads from the materialized view when enabled, otherwise aggregates
+    the events table inline.
+    """
+    if settings.conversation_stats_mv_enabled:
+        return "conversation_stats AS (SELECT * FROM conversation_stats_mv)"
+    return f"conversation_stats AS ({CONVERSATION_STATS_SQL})"
+
+
+def _encode_cursor(updated_at: datetime, sender_id: str) -> str:
+    """Encode the (updated_at, sender_id) keyset position of a row as an opaque cursor"""
+    payload = json.dumps([updated_at.isoformat(), sender_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by _encode_cursor"""
+    try:
+        updated_at, sender_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), sender_id
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
 
 
 def get_conversations_list(
@@ -23,11 +80,19 @@ def get_conversations_list(
     confidence_min: Optional[float] = None,
     confidence_max: Optional[float] = None,
     sender_id: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    last_message_maxlen: int = 100
 ) -> Dict[str, Any]:
     """
     Get paginated list of conversations with filters
 
+    Pages are ordered by (updated_at, sender_id) descending. When ``cursor``
+    (the ``next_cursor`` of the previous page) is given, the page is fetched
+    by keyset (seek) instead of OFFSET, so deep pages cost the same as the
+    first one; ``page`` is then only used to report position and totals.
+
     Args:
         db: Database session
         page: Page number (1-indexed)
@@ -39,16 +104,22 @@ def get_conversations_list(
         confidence_max: Maximum confidence score (0-1)
         sender_id: Filter by specific sender_id
         search: Text search in messages
+        cursor: Keyset cursor from the previous page's next_cursor
+        fields: Only include these item fields (unknown names are ignored)
+        last_message_maxlen: Truncate last_message to this many characters (in SQL)
 
     Returns:
         dict: Paginated conversation list with metadata
+
+    Raises:
+        ValueError: If cursor is malformed
     """
     # Calculate offset
     offset = (page - 1) * limit
 
     # Build WHERE clauses
     where_clauses = []
-    params = {}
+    params = {"last_message_maxlen": last_message_maxlen}
 
     if date_from:
         where_clauses.append("rc.updated_at >= :date_from")
@@ -69,26 +140,7 @@ def get_conversations_list(
 
     # Base query for conversation summaries with aggregated data
     base_query = f"""
-        WITH conversation_stats AS (
-            SELECT
-                e.sender_id,
-                COUNT(*) as msg_count,
-                MAX(e.timestamp) as last_timestamp,
-                AVG(CASE
-                    WHEN e.data::jsonb->'parse_data'->'intent'->>'confidence' IS NOT NULL
-                    THEN CAST(e.data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT)
-                    ELSE NULL
-                END) as avg_conf,
-                MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent,
-                MAX(CASE
-                    WHEN e.type_name = 'user'
-                    THEN e.data::jsonb->'parse_data'->>'text'
-                    ELSE NULL
-                END) as last_user_msg
-            FROM events e
-            WHERE e.type_name = 'user'
-            GROUP BY e.sender_id
-        )
+        WITH {_conversation_stats_cte()}
         SELECT
             rc.sender_id,
             rc.created_at,
@@ -98,8 +150,9 @@ def get_conversations_list(
             COALESCE(cs.msg_count, 0) as message_count,
             cs.primary_intent,
             cs.avg_conf as avg_confidence,
-            cs.last_user_msg as last_message,
-            FALSE as is_flagged
+            LEFT(cs.last_user_msg, :last_message_maxlen) as last_message,
+            FALSE as is_flagged,
+            COUNT(*) OVER () as total_count
         FROM rasa_conversations rc
         LEFT JOIN conversation_stats cs ON rc.sender_id = cs.sender_id
         {where_sql}
@@ -110,11 +163,9 @@ def get_conversations_list(
     additional_where = []
 
     if intents:
-        intent_list = [i.strip() for i in intents.split(",")]
-        intent_placeholders = ", ".join([f":intent_{i}" for i in range(len(intent_list))])
-        additional_where.append(f"cs.primary_intent IN ({intent_placeholders})")
-        for i, intent in enumerate(intent_list):
-            params[f"intent_{i}"] = intent
+        # Single array parameter keeps the SQL text identical for any number of intents
+        additional_where.append("cs.primary_intent = ANY(:intents)")
+        params["intents"] = [i.strip() for i in intents.split(",")]
 
     if confidence_min is not None:
         additional_where.append("cs.avg_conf >= :confidence_min")
@@ -136,24 +187,37 @@ def get_conversations_list(
         else:
             base_query += " WHERE " + " AND ".join(additional_where)
 
-    # Count total matching records
-    count_query = f"SELECT COUNT(*) FROM ({base_query}) as filtered"
-    total_result = db.execute(text(count_query), params).fetchone()
-    total = total_result[0] if total_result else 0
-
-    # Calculate pages
-    pages = math.ceil(total / limit) if total > 0 else 1
+    # Keyset position: rows strictly after the last row of the previous page
+    page_params = {**params, "limit": limit, "offset": offset}
+    keyset_sql = ""
+    if cursor:
+        page_params["cursor_updated_at"], page_params["cursor_sender_id"] = _decode_cursor(cursor)
+        page_params["offset"] = 0
+        keyset_sql = (" AND " if where_sql or additional_where else " WHERE ") + \
+            "(rc.updated_at, rc.sender_id) < (:cursor_updated_at, :cursor_sender_id)"
 
-    # Get paginated results
+    # Get paginated results (total_count window gives the unpaginated total in the same round trip)
     paginated_query = f"""
-        {base_query}
-        ORDER BY rc.updated_at DESC
+        {base_query}{keyset_sql}
+        ORDER BY rc.updated_at DESC, rc.sender_id DESC
         LIMIT :limit OFFSET :offset
     """
-    params["limit"] = limit
-    params["offset"] = offset
+    results = db.execute(text(paginated_query), page_params).fetchall()
+
+    if results:
+        # With a cursor the window only counts rows after it; add the pages already seen
+        total = results[0][10] + (offset if cursor else 0)
+    elif cursor:
+        total = offset
+    elif offset > 0:
+        # Page past the end: no rows to carry the window count, so count separately
+        count_query = f"SELECT COUNT(*) FROM ({base_query}) as filtered"
+        total = db.execute(text(count_query), params).scalar() or 0
+    else:
+        total = 0
 
-    results = db.execute(text(paginated_query), params).fetchall()
+    # Calculate pages
+    pages = math.ceil(total / limit) if total > 0 else 1
 
     # Format results
     items = []
@@ -165,17 +229,27 @@ def get_conversations_list(
             "message_count": row[5] or 0,
             "primary_intent": row[6],
             "avg_confidence": round(row[7] * 100, 2) if row[7] else 0,
-            "last_message": row[8][:100] if row[8] else None,  # Truncate to 100 chars
+            "last_message": row[8] or None,  # Truncated in SQL
             "is_flagged": row[9] or False,
             "active": row[4] or True
         })
 
+    # Cursor for the following page (None on the last page)
+    next_cursor = None
+    if len(results) == limit and page < pages:
+        last = results[-1]
+        next_cursor = _encode_cursor(last[2], last[0])
+
+    if fields:
+        items = [{field: item[field] for field in fields if field in item} for item in items]
+
     return {
         "total": total,
         "page": page,
         "pages": pages,
         "limit": limit,
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor
     }
 
 
@@ -190,56 +264,79 @@ def get_conversation_detail(db: Session, sender_id: str) -> Optional[Dict[str, A
     Returns:
         dict: Detailed conversation data or None if not found
     """
-    # Check if conversation exists
-    conversation = db.execute(text("""
-        SELECT sender_id, created_at, updated_at, customer_id, active
-        FROM rasa_conversations
-        WHERE sender_id = :sender_id
-    """), {"sender_id": sender_id}).fetchone()
+    return get_conversation_details_batch(db, [sender_id]).get(sender_id)
 
-    if not conversation:
-        return None
 
-    # Get all events for this conversation
-    events = db.execute(text("""
+def get_conversation_details_batch(db: Session, sender_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get detailed views of several conversations in a single query
+
+    Args:
+        db: Database session
+        sender_ids: Sender IDs to retrieve
+
+    Returns:
+        dict: Detailed conversation data keyed by sender_id (unknown IDs are omitted)
+    """
+    # Conversations plus all their events in one round trip. The conversation
+    # columns repeat on every row; a conversation without events still
+    # yields one row with NULL event columns. Only the message fields are
+    # extracted from data, so the raw JSON blobs never leave the database.
+    rows = db.execute(text("""
         SELECT
-            id,
-            type_name,
-            timestamp,
-            intent_name,
-            action_name,
-            data
-        FROM events
-        WHERE sender_id = :sender_id
-        ORDER BY timestamp ASC
-    """), {"sender_id": sender_id}).fetchall()
+            rc.sender_id,
+            rc.created_at,
+            rc.updated_at,
+            rc.customer_id,
+            rc.active,
+            e.id,
+            e.type_name,
+            e.timestamp,
+            e.action_name,
+            CASE e.type_name
+                WHEN 'user' THEN COALESCE(e.user_text, '')
+                WHEN 'bot' THEN COALESCE(e.data::jsonb->>'text', '')
+            END as message_text,
+            e.intent_name as intent,
+            COALESCE(e.intent_confidence, 0) as confidence,
+            CASE
+                WHEN e.entity_count > 0 THEN e.data::jsonb#>'{parse_data,entities}'
+                ELSE '[]'::jsonb
+            END as entities
+        FROM rasa_conversations rc
+        LEFT JOIN events e ON e.sender_id = rc.sender_id
+        WHERE rc.sender_id = ANY(:sender_ids)
+        ORDER BY rc.sender_id, e.timestamp ASC
+    """), {"sender_ids": list(sender_ids)}).fetchall()
+
+    return {
+        sender_id: _build_conversation_detail(list(group))
+        for sender_id, group in groupby(rows, key=lambda row: row[0])
+    }
+
+
+def _build_conversation_detail(rows: List[Any]) -> Dict[str, Any]:
+    """Build the detail dict of one conversation from its joined event rows"""
+    conversation = rows[0]
 
     # Parse messages
     messages = []
     intents_set = set()
     confidence_scores = []
 
-    for event in events:
-        event_type = event[1]
-        timestamp = event[2]
-        intent_name = event[3]
-        action_name = event[4]
-        data_str = event[5]
+    for event in rows:
+        if event[5] is None:
+            continue
 
-        # Parse JSON data
-        try:
-            data = json.loads(data_str) if data_str else {}
-        except:
-            data = {}
+        event_type = event[6]
+        timestamp = event[7]
+        action_name = event[8]
+        message_text = event[9]
 
         # Process user messages
         if event_type == "user":
-            parse_data = data.get("parse_data", {})
-            user_text = parse_data.get("text", "")
-            intent_data = parse_data.get("intent", {})
-            intent = intent_data.get("name", intent_name)
-            confidence = intent_data.get("confidence", 0)
-            entities = parse_data.get("entities", [])
+            intent = event[10]
+            confidence = event[11]
 
             if intent:
                 intents_set.add(intent)
@@ -249,20 +346,19 @@ def get_conversation_detail(db: Session, sender_id: str) -> Optional[Dict[str, A
             messages.append({
                 "timestamp": timestamp,
                 "type": "user",
-                "text": user_text,
+                "text": message_text,
                 "intent": intent,
                 "confidence": confidence,
-                "entities": entities,
+                "entities": event[12],
                 "action": None
             })
 
         # Process bot messages
         elif event_type == "bot":
-            bot_text = data.get("text", "")
             messages.append({
                 "timestamp": timestamp,
                 "type": "bot",
-                "text": bot_text,
+                "text": message_text,
                 "intent": None,
                 "confidence": None,
                 "entities": [],
@@ -272,7 +368,7 @@ def get_conversation_detail(db: Session, sender_id: str) -> Optional[Dict[str, A
         # Skip other event types (session_started, action, etc.)
 
     # Calculate average confidence
-    avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
+    avg_confidence = fmean(confidence_scores) if confidence_scores else 0
 
     return {
         "sender_id": conversation[0],
@@ -307,11 +403,11 @@ def flag_conversation(
         dict: Result of flagging operation
     """
     # Check if conversation exists
-    conversation = db.execute(text("""
-        SELECT sender_id FROM rasa_conversations WHERE sender_id = :sender_id
-    """), {"sender_id": sender_id}).fetchone()
+    exists = db.execute(text("""
+        SELECT EXISTS(SELECT 1 FROM rasa_conversations WHERE sender_id = :sender_id)
+    """), {"sender_id": sender_id}).scalar()
 
-    if not conversation:
+    if not exists:
         raise ValueError(f"Conversation not found: {sender_id}")
 
     # Mark conversation for review using conversation_reviews table
@@ -368,25 +464,108 @@ def flag_conversation(
     }
 
 
+def flag_conversations_bulk(
+    db: Session,
+    sender_ids: List[str],
+    reason: Optional[str] = None,
+    priority: str = "normal"
+) -> Dict[str, Any]:
+    """
+    Flag several conversations for review in a single statement
+
+    Same upsert as flag_conversation, but the rows come from an
+    INSERT ... SELECT over rasa_conversations, so existence check and
+    upsert for every sender_id happen in one round trip.
+
+    Args:
+        db: Database session
+        sender_ids: Sender IDs to flag
+        reason: Reason for flagging
+        priority: Priority level (low, normal, high)
+
+    Returns:
+        dict: Flagged and not-found sender IDs
+    """
+    sender_ids = list(dict.fromkeys(sender_ids))  # Dedupe, keep order
+    now_guatemala = datetime.now(GUATEMALA_TZ).replace(tzinfo=None)
+
+    result = db.execute(text("""
+        INSERT INTO conversation_reviews (
+            conversation_id,
+            status,
+            notes,
+            reviewed_at,
+            has_issues
+        )
+        SELECT rc.sender_id, 'needs_work', :reason, :reviewed_at, true
+        FROM rasa_conversations rc
+        WHERE rc.sender_id = ANY(:sender_ids)
+        ON CONFLICT (conversation_id) DO UPDATE
+        SET
+            status = 'needs_work',
+            notes = CASE
+                WHEN conversation_reviews.notes IS NOT NULL
+                THEN conversation_reviews.notes || E'\\n---\\n' || :reason
+                ELSE :reason
+            END,
+            reviewed_at = :reviewed_at,
+            has_issues = true,
+            issue_count = conversation_reviews.issue_count + 1
+        RETURNING conversation_id
+    """), {
+        "sender_ids": sender_ids,
+        "reason": reason or "Marcado desde UI",
+        "reviewed_at": now_guatemala
+    })
+    flagged = {row[0] for row in result}
+
+    db.commit()
+
+    return {
+        "success": True,
+        "message": f"{len(flagged)} conversations flagged for review",
+        "flagged": [sid for sid in sender_ids if sid in flagged],
+        "not_found": [sid for sid in sender_ids if sid not in flagged],
+        "flagged_at": now_guatemala.isoformat()
+    }
+
+
 def get_available_intents(db: Session) -> List[str]:
     """
     Get list of all unique intents in the system
 
+    The list changes slowly, so it is cached in-process for
+    settings.available_intents_cache_ttl seconds (0 disables the cache).
+
     Args:
         db: Database session
 
     Returns:
         list: List of intent names
     """
-    result = db.execute(text("""
-        SELECT DISTINCT intent_name
-        FROM events
-        WHERE intent_name IS NOT NULL
-        AND type_name = 'user'
-        ORDER BY intent_name
-    """)).fetchall()
+    global _available_intents_cache
+
+    cached = _available_intents_cache
+    if cached and cached[0] > time.monotonic():
+        return list(cached[1])
+
+    with _available_intents_lock:
+        cached = _available_intents_cache
+        if cached and cached[0] > time.monotonic():
+            return list(cached[1])
+
+        result = db.execute(text("""
+            SELECT DISTINCT intent_name
+            FROM events
+            WHERE intent_name IS NOT NULL
+            AND type_name = 'user'
+            ORDER BY intent_name
+        """)).fetchall()
+
+        intents = [row[0] for row in result if row[0]]
+        _available_intents_cache = (time.monotonic() + settings.available_intents_cache_ttl, intents)
 
-    return [row[0] for row in result if row[0]]
+    return list(intents)
 
 
 def export_conversations_csv(
@@ -394,10 +573,13 @@ def export_conversations_csv(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     intents: Optional[str] = None
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
     Export conversations to CSV format (returns data, actual CSV generation in router)
 
+    The query is executed up front (so errors surface to the caller) and rows
+    are streamed through a server-side cursor as the iterator is consumed.
+
     Args:
         db: Database session
         date_from: Start date filter
@@ -405,7 +587,7 @@ def export_conversations_csv(
         intents: Comma-separated intent filter
 
     Returns:
-        list: Conversation data for CSV export
+        iterator: Conversation rows for CSV export
     """
     # Build WHERE clauses
     where_clauses = []
@@ -425,20 +607,7 @@ def export_conversations_csv(
 
     # Query for export (no pagination, but limited to reasonable size)
     query = f"""
-        WITH conversation_stats AS (
-            SELECT
-                e.sender_id,
-                COUNT(*) as msg_count,
-                AVG(CASE
-                    WHEN e.data::jsonb->'parse_data'->'intent'->>'confidence' IS NOT NULL
-                    THEN CAST(e.data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT)
-                    ELSE NULL
-                END) as avg_conf,
-                MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent
-            FROM events e
-            WHERE e.type_name = 'user'
-            GROUP BY e.sender_id
-        )
+        WITH {_conversation_stats_cte()}
         SELECT
             rc.sender_id,
             rc.created_at,
@@ -453,18 +622,32 @@ def export_conversations_csv(
         LIMIT 10000
     """
 
-    results = db.execute(text(query), params).fetchall()
+    results = db.execute(text(query).execution_options(yield_per=EXPORT_FETCH_SIZE), params)
+
+    return _format_export_rows(results)
+
 
-    # Format for CSV
-    export_data = []
+def _format_export_rows(results) -> Iterator[Dict[str, Any]]:
+    """Format streamed export rows for CSV"""
     for row in results:
-        export_data.append({
+        yield {
             "sender_id": row[0],
             "created_at": row[1].isoformat() if row[1] else "",
             "message_count": row[2] or 0,
             "primary_intent": row[3] or "",
             "avg_confidence": round(row[4] * 100, 2) if row[4] else 0,
             "active": row[5] or False
-        })
+        }
+
 
-    return export_data
+def refresh_conversation_stats(db: Session) -> None:
+    """
+    Refresh the conversation_stats_mv materialized view
+
+    CONCURRENTLY keeps the view readable while it is rebuilt.
+
+    Args:
+        db: Database session
+    """
+    db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY conversation_stats_mv"))
+    db.commit()
@@ -5,15 +5,25 @@ Handles conversion of approved annotations to RASA NLU format (YAML).
 Provides validation and preview capabilities before exporting.
 """
 
+from collections import Counter, defaultdict
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, text
+from sqlalchemy import Row, and_, text
 import yaml
 import re
 
 from api.schemas.db_models import Annotation
 
+# libyaml-backed loader when PyYAML was built with it (much faster than the pure-Python one)
+try:
+    from yaml import CSafeLoader as _YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlSafeLoader
+
+# Entity annotation in RASA markdown: [entity_text](entity_type)
+_ENTITY_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+
 
 # ============================================
 # Helper Functions
@@ -37,23 +47,24 @@ def _format_entity_in_text(text: str, entities: List[Dict[str, Any]]) -> str:
     if not entities:
         return text
 
-    # Sort entities by start position (reverse order for replacement)
-    sorted_entities = sorted(entities, key=lambda e: e['start'], reverse=True)
-
-    result = text
-    for entity in sorted_entities:
+    # Single forward pass over entities sorted by start position,
+    # collecting pieces and joining once instead of re-slicing the string
+    parts = []
+    pos = 0
+    for entity in sorted(entities, key=lambda e: e['start']):
         start = entity['start']
         end = entity['end']
-        entity_type = entity['entity']
 
-        # Extract entity text from original
-        entity_text = text[start:end]
+        if start < pos:
+            continue  # Overlaps the previous entity
+
+        parts.append(text[pos:start])
+        parts.append(f"[{text[start:end]}]({entity['entity']})")
+        pos = end
 
-        # Replace with markdown format
-        markdown_entity = f"[{entity_text}]({entity_type})"
-        result = result[:start] + markdown_entity + result[end:]
+    parts.append(text[pos:])
 
-    return result
+    return ''.join(parts)
 
 
 def _validate_intent_exists(intent: str, existing_intents: List[str]) -> Tuple[bool, Optional[str]]:
@@ -103,10 +114,13 @@ def get_approved_annotations(
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     intent_filter: Optional[str] = None
-) -> List[Annotation]:
+) -> List[Row]:
     """
     Get approved annotations ready for export.
 
+    Only the columns the export uses are selected, returned as lightweight
+    rows (attribute access like the ORM objects, without hydrating them).
+
     Args:
         db: Database session
         from_date: Optional start date filter
@@ -114,9 +128,13 @@ def get_approved_annotations(
         intent_filter: Optional filter by corrected intent
 
     Returns:
-        List of approved annotations
+        List of rows with corrected_intent, message_text, corrected_entities
     """
-    query = db.query(Annotation).filter(Annotation.status == 'approved')
+    query = db.query(
+        Annotation.corrected_intent,
+        Annotation.message_text,
+        Annotation.corrected_entities
+    ).filter(Annotation.status == 'approved')
 
     # Apply date filters
     if from_date:
@@ -136,12 +154,13 @@ def get_approved_annotations(
     return query.all()
 
 
-def convert_annotations_to_nlu_dict(annotations: List[Annotation]) -> Dict[str, List[str]]:
+def convert_annotations_to_nlu_dict(annotations: List[Row]) -> Dict[str, List[str]]:
     """
     Convert annotations to NLU format dictionary grouped by intent.
 
     Args:
-        annotations: List of Annotation objects
+        annotations: Rows (or Annotation objects) with corrected_intent,
+            message_text and corrected_entities
 
     Returns:
         Dictionary with intent names as keys and lists of formatted examples as values
@@ -157,7 +176,8 @@ def convert_annotations_to_nlu_dict(annotations: List[Annotation]) -> Dict[str,
             ]
         }
     """
-    nlu_dict = {}
+    nlu_dict = defaultdict(list)
+    seen = defaultdict(set)  # Per-intent membership for O(1) duplicate checks
 
     for annotation in annotations:
         intent = annotation.corrected_intent
@@ -165,21 +185,18 @@ def convert_annotations_to_nlu_dict(annotations: List[Annotation]) -> Dict[str,
         if not intent:
             continue  # Skip if no corrected intent
 
-        # Initialize intent list if not exists
-        if intent not in nlu_dict:
-            nlu_dict[intent] = []
-
         # Format example with entities
         formatted_example = _format_entity_in_text(
             annotation.message_text,
             annotation.corrected_entities or []
         )
 
-        # Add to list (avoid duplicates)
-        if formatted_example not in nlu_dict[intent]:
+        # Add to list (avoid duplicates, keep first-seen order)
+        if formatted_example not in seen[intent]:
+            seen[intent].add(formatted_example)
             nlu_dict[intent].append(formatted_example)
 
-    return nlu_dict
+    return dict(nlu_dict)
 
 
 def convert_to_rasa_nlu_yaml(nlu_dict: Dict[str, List[str]]) -> str:
@@ -192,34 +209,17 @@ def convert_to_rasa_nlu_yaml(nlu_dict: Dict[str, List[str]]) -> str:
     Returns:
         YAML string in RASA format
     """
-    # Build NLU data structure
-    nlu_data = []
+    # Custom formatting: examples go in a literal block (|) with leading
+    # dash and indentation, so the YAML is assembled by hand
+    parts = ["version: \"3.1\"\n\nnlu:\n"]
 
     for intent, examples in sorted(nlu_dict.items()):
-        # Format examples with leading dash and proper indentation
-        examples_text = "\n".join([f"    - {example}" for example in examples])
-
-        nlu_data.append({
-            'intent': intent,
-            'examples': examples_text  # Will be formatted as literal block
-        })
-
-    # Create final structure
-    output = {
-        'version': '3.1',
-        'nlu': nlu_data
-    }
+        parts.append(f"- intent: {intent}\n")
+        parts.append("  examples: |\n")
+        parts.extend(f"    - {example}\n" for example in examples)
+        parts.append("\n")
 
-    # Convert to YAML with proper formatting
-    # We need custom formatting for the examples block
-    yaml_str = "version: \"3.1\"\n\nnlu:\n"
-
-    for item in nlu_data:
-        yaml_str += f"- intent: {item['intent']}\n"
-        yaml_str += f"  examples: |\n"
-        yaml_str += f"{item['examples']}\n\n"
-
-    return yaml_str
+    return "".join(parts)
 
 
 def validate_nlu_yaml(yaml_content: str) -> Tuple[bool, List[str], List[str]]:
@@ -237,7 +237,7 @@ def validate_nlu_yaml(yaml_content: str) -> Tuple[bool, List[str], List[str]]:
 
     try:
         # Parse YAML
-        data = yaml.safe_load(yaml_content)
+        data = yaml.load(yaml_content, Loader=_YamlSafeLoader)
 
         # Check version
         if 'version' not in data:
@@ -296,10 +296,10 @@ def get_existing_intents_from_db(db: Session) -> List[str]:
         List of unique intent names
     """
     query = text("""
-        SELECT DISTINCT data::jsonb->'parse_data'->'intent'->>'name' as intent_name
+        SELECT DISTINCT intent_name
         FROM events
         WHERE type_name = 'user'
-          AND data::jsonb->'parse_data'->'intent'->>'name' IS NOT NULL
+          AND intent_name IS NOT NULL
         ORDER BY intent_name
     """)
 
@@ -323,7 +323,7 @@ def get_existing_entities_from_db(db: Session) -> List[str]:
         SELECT DISTINCT jsonb_array_elements(data::jsonb->'parse_data'->'entities')->>'entity' as entity_type
         FROM events
         WHERE type_name = 'user'
-          AND jsonb_array_length(data::jsonb->'parse_data'->'entities') > 0
+          AND entity_count > 0
         ORDER BY entity_type
     """)
 
@@ -333,6 +333,45 @@ def get_existing_entities_from_db(db: Session) -> List[str]:
     return entities
 
 
+def get_existing_intents_and_entities_from_db(db: Session) -> Tuple[List[str], List[str]]:
+    """
+    Get unique intents and entity types from events table in a single query.
+
+    Intents come from the intent_name column; data is only parsed for
+    events that have entities (entity_count > 0).
+
+    Args:
+        db: Database session
+
+    Returns:
+        Tuple of (intent names, entity type names)
+    """
+    query = text("""
+        SELECT DISTINCT 'intent' as kind, intent_name as name
+        FROM events
+        WHERE type_name = 'user'
+          AND intent_name IS NOT NULL
+        UNION ALL
+        SELECT DISTINCT 'entity' as kind, jsonb_array_elements(data::jsonb->'parse_data'->'entities')->>'entity' as name
+        FROM events
+        WHERE type_name = 'user'
+          AND entity_count > 0
+        ORDER BY kind, name
+    """)
+
+    intents = []
+    entities = []
+    for kind, name in db.execute(query):
+        if not name:
+            continue
+        if kind == 'intent':
+            intents.append(name)
+        else:
+            entities.append(name)
+
+    return intents, entities
+
+
 def get_nlu_export_stats(nlu_dict: Dict[str, List[str]]) -> Dict[str, Any]:
     """
     Calculate statistics for NLU export.
@@ -347,19 +386,17 @@ def get_nlu_export_stats(nlu_dict: Dict[str, List[str]]) -> Dict[str, Any]:
     total_examples = sum(len(examples) for examples in nlu_dict.values())
 
     # Calculate entity usage
-    entity_count = {}
+    entity_count = Counter()
     for examples in nlu_dict.values():
         for example in examples:
             # Find all entities in format [text](entity_type)
-            entities = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', example)
-            for _, entity_type in entities:
-                entity_count[entity_type] = entity_count.get(entity_type, 0) + 1
+            entity_count.update(entity_type for _, entity_type in _ENTITY_RE.findall(example))
 
     return {
         'total_intents': total_intents,
         'total_examples': total_examples,
         'total_entities_used': len(entity_count),
-        'entity_usage': entity_count,
+        'entity_usage': dict(entity_count),
         'avg_examples_per_intent': round(total_examples / total_intents, 2) if total_intents > 0 else 0
     }
 
@@ -381,9 +418,9 @@ def validate_annotations_export(
     errors = []
     warnings = []
 
-    # Get existing intents and entities from database
-    existing_intents = get_existing_intents_from_db(db)
-    existing_entities = get_existing_entities_from_db(db)
+    # Get existing intents and entities from database (one round trip)
+    existing_intents, existing_entities = get_existing_intents_and_entities_from_db(db)
+    existing_entities = set(existing_entities)
 
     # Validate each intent
     for intent, examples in nlu_dict.items():
@@ -395,7 +432,7 @@ def validate_annotations_export(
         # Validate entities in examples
         for example in examples:
             # Extract entities from markdown format
-            entities_in_example = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', example)
+            entities_in_example = _ENTITY_RE.findall(example)
             for _, entity_type in entities_in_example:
                 if entity_type not in existing_entities:
                     warning_msg = f"Entity '{entity_type}' in intent '{intent}' not found in existing data"
@@ -0,0 +1,80 @@
+"""
+Redis-backed memoization for dashboard metrics
+
+Dashboard aggregations change slowly (events are append-only), so results are
+cached for a short TTL instead of being invalidated on write.
+"""
+from functools import wraps
+from typing import Any, Callable, Optional
+import inspect
+import logging
+import time
+
+import orjson
+import redis
+
+from api.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    """Get the shared Redis client (created on first use)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+    return _redis_client
+
+
+def cached(ttl: Optional[int] = None) -> Callable:
+    """
+    Cache a metrics function's result in Redis
+
+    The key is built from the function name, its arguments (except the
+    database session) and a time bucket of ``ttl`` seconds, so entries roll
+    over on their own. Any Redis error falls back to calling the function.
+
+    Args:
+        ttl: Cache lifetime in seconds (defaults to settings.metrics_cache_ttl; 0 disables)
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(db, *args, **kwargs) -> Any:
+            cache_ttl = settings.metrics_cache_ttl if ttl is None else ttl
+            if cache_ttl <= 0:
+                return fn(db, *args, **kwargs)
+
+            bound = signature.bind(db, *args, **kwargs)
+            bound.apply_defaults()
+            key_args = ":".join(f"{name}={value}" for name, value in bound.arguments.items() if name != "db")
+            key = f"metrics:{fn.__name__}:{key_args}:{int(time.time() // cache_ttl)}"
+
+            try:
+                hit = _get_redis().get(key)
+                if hit is not None:
+                    return orjson.loads(hit)
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Metrics cache read failed for {key}: {e}")
+                return fn(db, *args, **kwargs)
+
+            result = fn(db, *args, **kwargs)
+
+            try:
+                _get_redis().set(key, orjson.dumps(result), ex=cache_ttl)
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Metrics cache write failed for {key}: {e}")
+
+            return result
+
+        return wrapper
+
+    return decorator
@@ -1,172 +1,367 @@
 """
 Metrics service for dashboard
 """
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Union
 from sqlalchemy.orm import Session
 from sqlalchemy import func, text
 import json
-import pytz
+from zoneinfo import ZoneInfo
+from api.config import get_settings
+from api.services.metrics_cache import cached
 
 # Timezone de Guatemala
-GUATEMALA_TZ = pytz.timezone('America/Guatemala')
+GUATEMALA_TZ = ZoneInfo('America/Guatemala')
+
+
+# Queries are built once at import time; SQLAlchemy's compiled cache (see
+# query_cache_size in api/database/connection.py) then reuses their compiled
+# form. psycopg2 has no server-side prepared statements.
+#
+# rasa_conversations has one row per sender_id (unique index from
+# database/03-sync-rasa-conversations.sql), so conversation counts use
+# COUNT(*) rather than COUNT(DISTINCT sender_id).
+# Only user events with an intent count, same rule as events_daily_rollup,
+# so exact and rollup summaries differ only in the window start
+SUMMARY_EVENTS_QUERY = text("""
+    WITH e AS MATERIALIZED (
+        SELECT intent_name, intent_confidence, entity_count
+        FROM events
+        WHERE type_name = 'user'
+        AND timestamp >= :since_timestamp
+        AND intent_name IS NOT NULL
+    )
+    SELECT
+        (SELECT COUNT(intent_confidence) FROM e) as total_intents,
+        (SELECT AVG(intent_confidence) FROM e) as avg_confidence,
+        (SELECT COUNT(*) FROM e WHERE entity_count > 0) as total_entities,
+        (SELECT json_agg(json_build_array(intent_name, count) ORDER BY count DESC)
+         FROM (
+            SELECT intent_name, COUNT(*) as count
+            FROM e
+            GROUP BY intent_name
+            ORDER BY count DESC
+            LIMIT 5
+         ) top) as top_intents
+""")
+
+SUMMARY_EVENTS_ROLLUP_QUERY = text("""
+    WITH r AS MATERIALIZED (
+        SELECT
+            intent_name,
+            SUM(cnt)::bigint as cnt,
+            SUM(sum_conf) as sum_conf,
+            SUM(conf_cnt)::bigint as conf_cnt,
+            SUM(entity_cnt)::bigint as entity_cnt
+        FROM events_daily_rollup
+        WHERE day >= :since_day
+        GROUP BY intent_name
+    )
+    SELECT
+        COALESCE(SUM(conf_cnt), 0)::bigint as total_intents,
+        SUM(sum_conf) / NULLIF(SUM(conf_cnt), 0) as avg_confidence,
+        COALESCE(SUM(entity_cnt), 0)::bigint as total_entities,
+        (SELECT json_agg(json_build_array(intent_name, cnt) ORDER BY cnt DESC)
+         FROM (
+            SELECT intent_name, cnt
+            FROM r
+            ORDER BY cnt DESC
+            LIMIT 5
+         ) top) as top_intents
+    FROM r
+""")
+
+SUMMARY_CONVERSATIONS_QUERY = text("""
+    SELECT
+        (SELECT COUNT(*)
+         FROM rasa_conversations
+         WHERE updated_at >= :since_date) as total_conversations,
+        (SELECT COUNT(*)
+         FROM rasa_conversations
+         WHERE active = true) as active_conversations,
+        dm.id,
+        dm.model_name,
+        dm.deployed_at,
+        dm.performance_metrics
+    FROM (SELECT 1) as one
+    LEFT JOIN (
+        SELECT id, model_name, deployed_at, performance_metrics
+        FROM deployed_models
+        WHERE is_active = true
+        ORDER BY deployed_at DESC
+        LIMIT 1
+    ) dm ON true
+""")
+
+TIMELINE_QUERY = text("""
+    WITH days AS (
+        SELECT generate_series(CAST(:since_date AS date), CAST(:until_day AS date), INTERVAL '1 day')::date as date
+    ),
+    agg AS (
+        SELECT
+            DATE(updated_at) as date,
+            COUNT(*) as conversations
+        FROM rasa_conversations
+        WHERE updated_at >= :since_date
+        GROUP BY 1
+    )
+    SELECT days.date, COALESCE(agg.conversations, 0)
+    FROM days
+    LEFT JOIN agg USING (date)
+    ORDER BY days.date
+""")
+
+INTENT_DISTRIBUTION_QUERY = text("""
+    SELECT
+        intent_name,
+        SUM(cnt)::bigint as count,
+        SUM(sum_conf) / NULLIF(SUM(conf_cnt), 0) as avg_confidence
+    FROM events_daily_rollup
+    WHERE day >= :since_day
+    GROUP BY intent_name
+    ORDER BY count DESC
+    LIMIT 10
+""")
+
+INTENT_DISTRIBUTION_EXACT_QUERY = text("""
+    SELECT
+        intent_name,
+        COUNT(*) as count,
+        AVG(intent_confidence) as avg_confidence
+    FROM events
+    WHERE type_name = 'user'
+    AND timestamp >= :since_timestamp
+    AND intent_name IS NOT NULL
+    GROUP BY intent_name
+    ORDER BY count DESC
+    LIMIT 10
+""")
+
+HEATMAP_QUERY = text("""
+    WITH agg AS (
+        SELECT
+            EXTRACT(DOW FROM updated_at)::int as day_of_week,
+            EXTRACT(HOUR FROM updated_at)::int as hour,
+            COUNT(*) as count
+        FROM rasa_conversations
+        WHERE updated_at >= :since_date
+        GROUP BY 1, 2
+    )
+    SELECT
+        (ARRAY['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado'])[d.day_of_week + 1] as day,
+        h.hour,
+        COALESCE(agg.count, 0)
+    FROM generate_series(0, 6) as d(day_of_week)
+    CROSS JOIN generate_series(0, 23) as h(hour)
+    LEFT JOIN agg USING (day_of_week, hour)
+    ORDER BY (d.day_of_week + 6) % 7, h.hour
+""")
+
+FUNNEL_QUERY = text("""
+    SELECT
+        COUNT(*) as total_started,
+        COUNT(*) FILTER (WHERE rc.active = true) as resolved,
+        (SELECT COUNT(DISTINCT e.sender_id)
+         FROM events e
+         WHERE e.type_name = 'user'
+         AND e.timestamp >= :since_timestamp
+         AND e.intent_confidence > 0.7) as high_confidence
+    FROM rasa_conversations rc
+    WHERE rc.updated_at >= :since_date
+""")
+
+# Oldest Guatemala day with user events (start of a full rollup rebuild)
+EVENTS_OLDEST_DAY_QUERY = text("""
+    SELECT (to_timestamp(MIN(timestamp)) AT TIME ZONE 'America/Guatemala')::date
+    FROM events
+    WHERE type_name = 'user'
+""")
+
+# Day before the newest rollup row, so days missed while the refresh wasn't
+# running (e.g. a Celery beat outage) are filled; the oldest event day when
+# the rollup is empty
+EVENTS_ROLLUP_RESUME_DAY_QUERY = text("""
+    SELECT COALESCE(
+        (SELECT MAX(day) FROM events_daily_rollup) - 1,
+        (SELECT (to_timestamp(MIN(timestamp)) AT TIME ZONE 'America/Guatemala')::date
+         FROM events
+         WHERE type_name = 'user')
+    )
+""")
+
+# Recomputed days are cleared first so intents that no longer have events
+# on a day (deleted/restored data) don't keep stale rows
+EVENTS_ROLLUP_DELETE_QUERY = text("""
+    DELETE FROM events_daily_rollup WHERE day >= :since_day
+""")
+
+EVENTS_ROLLUP_UPSERT_QUERY = text("""
+    INSERT INTO events_daily_rollup (day, intent_name, cnt, sum_conf, conf_cnt, entity_cnt)
+    SELECT
+        (to_timestamp(timestamp) AT TIME ZONE 'America/Guatemala')::date as day,
+        intent_name,
+        COUNT(*),
+        SUM(intent_confidence),
+        COUNT(intent_confidence),
+        COUNT(*) FILTER (WHERE entity_count > 0)
+    FROM events
+    WHERE type_name = 'user'
+    AND timestamp >= :since_timestamp
+    AND intent_name IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (day, intent_name) DO UPDATE
+    SET
+        cnt = EXCLUDED.cnt,
+        sum_conf = EXCLUDED.sum_conf,
+        conf_cnt = EXCLUDED.conf_cnt,
+        entity_cnt = EXCLUDED.entity_cnt,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+
+@dataclass(frozen=True)
+class MetricsWindow:
+    """Look-back window shared by the metric functions of one request"""
+    days: int
+    # Naive Guatemala time, for TIMESTAMP columns (PostgreSQL ya tiene TZ configurado)
+    since_naive: datetime
+    # Unix epoch, for events.timestamp
+    since_ts: float
+
+    def __str__(self) -> str:
+        # Used by the metrics cache key: the window is identified by its length
+        return str(self.days)
+
+
+def make_window(days: Union[int, MetricsWindow]) -> MetricsWindow:
+    """
+    Build the window for the last ``days`` days (Guatemala time)
 
+    Args:
+        days: Number of days to look back, or an already computed window
 
-def get_summary_metrics(db: Session, days: int = 7) -> Dict[str, Any]:
+    Returns:
+        MetricsWindow: The window (returned as is if one was passed)
+    """
+    if isinstance(days, MetricsWindow):
+        return days
+    since = datetime.now(GUATEMALA_TZ) - timedelta(days=days)
+    return MetricsWindow(days=days, since_naive=since.replace(tzinfo=None), since_ts=since.timestamp())
+
+
+@cached()
+def get_summary_metrics(
+    db: Session,
+    days: Union[int, MetricsWindow] = 7,
+    exact: bool = False
+) -> Dict[str, Any]:
     """
     Get summary metrics for dashboard
 
     Args:
         db: Database session
-        days: Number of days to look back
+        days: Number of days to look back (or a precomputed MetricsWindow)
+        exact: Scan events for the exact window instead of reading the
+            daily rollup (whole Guatemala days)
+
+    Both paths count only user events with an intent (intent_name not
+    NULL) for intents, confidence and entities; they differ only in where
+    the window starts (now - days vs the start of that Guatemala day).
 
     Returns:
         dict: Summary metrics
     """
-    # Usar hora de Guatemala
-    now_guatemala = datetime.now(GUATEMALA_TZ)
-    since_date = now_guatemala - timedelta(days=days)
-    # Convertir a naive datetime para queries (PostgreSQL ya tiene TZ configurado)
-    since_date_naive = since_date.replace(tzinfo=None)
-    since_timestamp = since_date.timestamp()
-
-    # Get total conversations from rasa_conversations table
-    total_conversations = db.execute(text("""
-        SELECT COUNT(DISTINCT sender_id) as total
-        FROM rasa_conversations
-        WHERE updated_at >= :since_date
-    """), {"since_date": since_date_naive}).fetchone()
+    window = make_window(days)
 
-    # Get intent statistics from events table using Unix timestamp
-    intent_stats = db.execute(text("""
-        SELECT
-            COUNT(*) as total_intents,
-            AVG(CAST(data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT)) as avg_confidence
-        FROM events
-        WHERE type_name = 'user'
-        AND timestamp >= :since_timestamp
-        AND data::jsonb->'parse_data'->'intent' IS NOT NULL
-    """), {"since_timestamp": since_timestamp}).fetchone()
-
-    # Get most common intents
-    top_intents = db.execute(text("""
-        SELECT
-            intent_name,
-            COUNT(*) as count
-        FROM events
-        WHERE type_name = 'user'
-        AND timestamp >= :since_timestamp
-        AND intent_name IS NOT NULL
-        GROUP BY intent_name
-        ORDER BY count DESC
-        LIMIT 5
-    """), {"since_timestamp": since_timestamp}).fetchall()
-
-    # Get entity statistics
-    entity_stats = db.execute(text("""
-        SELECT COUNT(*) as total_entities
-        FROM events
-        WHERE type_name = 'user'
-        AND timestamp >= :since_timestamp
-        AND jsonb_array_length(COALESCE(data::jsonb->'parse_data'->'entities', '[]'::jsonb)) > 0
-    """), {"since_timestamp": since_timestamp}).fetchone()
+    # Round trip 1: all events-based stats (intent count/avg confidence,
+    # entity count, top 5 intents), from the rollup or a single scan of the
+    # period's user events
+    if exact:
+        event_stats = db.execute(SUMMARY_EVENTS_QUERY, {"since_timestamp": window.since_ts}).fetchone()
+    else:
+        event_stats = db.execute(SUMMARY_EVENTS_ROLLUP_QUERY, {"since_day": window.since_naive.date()}).fetchone()
 
-    # Get conversations count (no pending_reviews in actual schema)
-    active_conversations = db.execute(text("""
-        SELECT COUNT(*) as total
-        FROM rasa_conversations
-        WHERE active = true
-    """)).fetchone()
+    # Round trip 2: conversation counts plus the current model
+    # (no pending_reviews in actual schema, active conversations are used instead)
+    conversation_stats = db.execute(SUMMARY_CONVERSATIONS_QUERY, {"since_date": window.since_naive}).fetchone()
 
-    # Get current model info
-    current_model = db.execute(text("""
-        SELECT model_name, deployed_at, performance_metrics
-        FROM deployed_models
-        WHERE is_active = true
-        ORDER BY deployed_at DESC
-        LIMIT 1
-    """)).fetchone()
+    total_conversations = conversation_stats[0]
+    active_conversations = conversation_stats[1]
+    current_model = conversation_stats[3:] if conversation_stats[2] is not None else None
+    top_intents = event_stats[3] or []
 
     return {
-        "period_days": days,
-        "total_conversations": total_conversations[0] if total_conversations else 0,
-        "avg_confidence": round(intent_stats[1] * 100, 2) if intent_stats and intent_stats[1] else 0,
-        "total_intents_detected": intent_stats[0] if intent_stats else 0,
-        "total_entities_detected": entity_stats[0] if entity_stats else 0,
-        "pending_reviews": active_conversations[0] if active_conversations else 0,
+        "period_days": window.days,
+        "total_conversations": total_conversations or 0,
+        "avg_confidence": round(event_stats[1] * 100, 2) if event_stats[1] else 0,
+        "total_intents_detected": event_stats[0] or 0,
+        "total_entities_detected": event_stats[2] or 0,
+        "pending_reviews": active_conversations or 0,
         "top_intents": [
             {"intent": row[0], "count": row[1]}
             for row in top_intents
         ] if top_intents else [],
         "current_model": {
             "name": current_model[0] if current_model else "N/A",
-            "trained_at": current_model[1].isoformat() if current_model and current_model[1] else None,
+            "trained_at": current_model[1] if current_model and current_model[1] else None,
             "accuracy": current_model[2].get('accuracy', 0) * 100 if current_model and current_model[2] and isinstance(current_model[2], dict) else 0
         } if current_model else None
     }
 
 
-def get_conversations_timeline(db: Session, days: int = 30) -> List[Dict[str, Any]]:
+@cached()
+def get_conversations_timeline(db: Session, days: Union[int, MetricsWindow] = 30) -> List[Dict[str, Any]]:
     """
     Get conversation count by day
 
     Args:
         db: Database session
-        days: Number of days
+        days: Number of days (or a precomputed MetricsWindow)
 
     Returns:
-        list: Timeline data
+        list: Timeline data, one row per day (days without conversations are 0)
     """
-    now_guatemala = datetime.now(GUATEMALA_TZ)
-    since_date = (now_guatemala - timedelta(days=days)).replace(tzinfo=None)
+    window = make_window(days)
+    until_day = (window.since_naive + timedelta(days=window.days)).date()
 
-    result = db.execute(text("""
-        SELECT
-            DATE(updated_at) as date,
-            COUNT(DISTINCT sender_id) as conversations
-        FROM rasa_conversations
-        WHERE updated_at >= :since_date
-        GROUP BY DATE(updated_at)
-        ORDER BY date
-    """), {"since_date": since_date}).fetchall()
+    # Gap-fill server-side so the frontend gets a dense series
+    result = db.execute(TIMELINE_QUERY, {"since_date": window.since_naive, "until_day": until_day}).fetchall()
 
     return [
         {
-            "date": row[0].isoformat(),
+            "date": row[0],
             "conversations": row[1]
         }
         for row in result
     ]
 
 
-def get_intent_distribution(db: Session, days: int = 7) -> List[Dict[str, Any]]:
+@cached()
+def get_intent_distribution(
+    db: Session,
+    days: Union[int, MetricsWindow] = 7,
+    exact: bool = False
+) -> List[Dict[str, Any]]:
     """
     Get distribution of intents
 
     Args:
         db: Database session
-        days: Number of days
+        days: Number of days (or a precomputed MetricsWindow)
+        exact: Scan events for the exact window instead of reading the
+            daily rollup (whole Guatemala days)
 
     Returns:
         list: Intent distribution
     """
-    now_guatemala = datetime.now(GUATEMALA_TZ)
-    since_date = now_guatemala - timedelta(days=days)
-    since_timestamp = since_date.timestamp()
+    window = make_window(days)
 
-    result = db.execute(text("""
-        SELECT
-            intent_name,
-            COUNT(*) as count,
-            AVG(CAST(data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT)) as avg_confidence
-        FROM events
-        WHERE type_name = 'user'
-        AND timestamp >= :since_timestamp
-        AND intent_name IS NOT NULL
-        GROUP BY intent_name
-        ORDER BY count DESC
-        LIMIT 10
-    """), {"since_timestamp": since_timestamp}).fetchall()
+    if exact:
+        result = db.execute(INTENT_DISTRIBUTION_EXACT_QUERY, {"since_timestamp": window.since_ts}).fetchall()
+    else:
+        # Read from the daily rollup (whole Guatemala days, see refresh_events_daily_rollup)
+        result = db.execute(INTENT_DISTRIBUTION_QUERY, {"since_day": window.since_naive.date()}).fetchall()
 
     return [
         {
@@ -178,89 +373,108 @@ def get_intent_distribution(db: Session, days: int = 7) -> List[Dict[str, Any]]:
     ]
 
 
-def get_hourly_heatmap(db: Session, days: int = 7) -> List[Dict[str, Any]]:
+@cached()
+def get_hourly_heatmap(db: Session, days: Union[int, MetricsWindow] = 7) -> Dict[str, Any]:
     """
     Get conversation count by hour of day and day of week
 
     Args:
         db: Database session
-        days: Number of days
+        days: Number of days (or a precomputed MetricsWindow)
 
     Returns:
-        list: Heatmap data
+        dict: 7x24 matrix ``z`` (rows follow ``days``, Monday first;
+        columns follow ``hours``), empty cells are 0
     """
-    now_guatemala = datetime.now(GUATEMALA_TZ)
-    since_date = (now_guatemala - timedelta(days=days)).replace(tzinfo=None)
+    since_date = make_window(days).since_naive
 
-    result = db.execute(text("""
-        SELECT
-            EXTRACT(DOW FROM updated_at) as day_of_week,
-            EXTRACT(HOUR FROM updated_at) as hour,
-            COUNT(*) as count
-        FROM rasa_conversations
-        WHERE updated_at >= :since_date
-        GROUP BY day_of_week, hour
-        ORDER BY day_of_week, hour
-    """), {"since_date": since_date}).fetchall()
+    # Gap-fill the full week x hour grid server-side; rows come back
+    # day by day (Monday first), 24 hours each
+    result = db.execute(HEATMAP_QUERY, {"since_date": since_date}).fetchall()
 
-    # Map day of week to names
-    day_names = ['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
+    day_names = []
+    z = []
+    for day, hour, count in result:
+        if hour == 0:
+            day_names.append(day)
+            z.append([])
+        z[-1].append(count)
 
-    return [
-        {
-            "day": day_names[int(row[0])],
-            "hour": int(row[1]),
-            "count": row[2]
-        }
-        for row in result
-    ]
+    return {
+        "days": day_names,
+        "hours": list(range(24)),
+        "z": z
+    }
 
 
-def get_success_rate_funnel(db: Session, days: int = 7) -> Dict[str, Any]:
+@cached()
+def get_success_rate_funnel(db: Session, days: Union[int, MetricsWindow] = 7) -> Dict[str, Any]:
     """
     Get conversation success rate funnel
 
     Args:
         db: Database session
-        days: Number of days
+        days: Number of days (or a precomputed MetricsWindow)
 
     Returns:
         dict: Funnel data
     """
-    now_guatemala = datetime.now(GUATEMALA_TZ)
-    since_date = now_guatemala - timedelta(days=days)
-    since_date_naive = since_date.replace(tzinfo=None)
-    since_timestamp = since_date.timestamp()
-
-    # Total conversations started
-    total = db.execute(text("""
-        SELECT COUNT(DISTINCT sender_id)
-        FROM rasa_conversations
-        WHERE updated_at >= :since_date
-    """), {"since_date": since_date_naive}).fetchone()
-
-    # Conversations with high confidence (>0.7)
-    high_confidence = db.execute(text("""
-        SELECT COUNT(DISTINCT e.sender_id)
-        FROM events e
-        WHERE e.type_name = 'user'
-        AND e.timestamp >= :since_timestamp
-        AND CAST(e.data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT) > 0.7
-    """), {"since_timestamp": since_timestamp}).fetchone()
-
-    # Active conversations (using existing schema)
-    resolved = db.execute(text("""
-        SELECT COUNT(DISTINCT sender_id)
-        FROM rasa_conversations
-        WHERE updated_at >= :since_date
-        AND active = true
-    """), {"since_date": since_date_naive}).fetchone()
+    window = make_window(days)
 
-    total_count = total[0] if total else 1  # Avoid division by zero
+    # Single round trip: total and active conversations come from one pass over
+    # rasa_conversations (FILTER), high-confidence senders from events
+    funnel = db.execute(FUNNEL_QUERY, {"since_date": window.since_naive, "since_timestamp": window.since_ts}).fetchone()
+
+    total_started = funnel[0] or 0
+    resolved = funnel[1] or 0
 
     return {
-        "total_started": total[0] if total else 0,
-        "high_confidence": high_confidence[0] if high_confidence else 0,
-        "resolved": resolved[0] if resolved else 0,
-        "conversion_rate": round((resolved[0] / total_count * 100) if resolved and total_count > 0 else 0, 2)
+        "total_started": total_started,
+        "high_confidence": funnel[2] or 0,
+        "resolved": resolved,
+        "conversion_rate": round(resolved / total_started * 100, 2) if total_started > 0 else 0
     }
+
+
+def refresh_events_daily_rollup(
+    db: Session,
+    since_day: Optional[date] = None,
+    full: bool = False
+) -> Optional[date]:
+    """
+    Recompute events_daily_rollup from a given day (Guatemala time) to today
+
+    Whole days are recomputed from events and replaced in one transaction,
+    so the job is idempotent and late-arriving events are picked up. By
+    default it starts at the earliest of:
+
+    - the day before the newest rollup row (fills days missed while the
+      refresh wasn't running; the oldest event day if the rollup is empty)
+    - today minus ``events_rollup_lookback_days`` (events inserted with
+      older timestamps, e.g. imported data, within that lookback)
+
+    Args:
+        db: Database session
+        since_day: Recompute from this day instead of the default start
+        full: Rebuild the whole rollup from the oldest event
+
+    Returns:
+        date: First recomputed day, or None if there are no user events
+    """
+    if full:
+        since_day = db.execute(EVENTS_OLDEST_DAY_QUERY).scalar()
+    elif since_day is None:
+        today = datetime.now(GUATEMALA_TZ).date()
+        lookback_day = today - timedelta(days=get_settings().events_rollup_lookback_days)
+        resume_day = db.execute(EVENTS_ROLLUP_RESUME_DAY_QUERY).scalar()
+        since_day = min(resume_day, lookback_day) if resume_day else lookback_day
+
+    if since_day is None:
+        return None
+
+    since = datetime.combine(since_day, datetime.min.time(), tzinfo=GUATEMALA_TZ)
+
+    db.execute(EVENTS_ROLLUP_DELETE_QUERY, {"since_day": since_day})
+    db.execute(EVENTS_ROLLUP_UPSERT_QUERY, {"since_timestamp": since.timestamp()})
+    db.commit()
+    return since_day
@@ -4,9 +4,17 @@ Celery application configuration
 from celery import Celery
 import os
 
+from api.config import get_settings
+
 # Redis URL from environment
 redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
+# Refresh interval for conversation_stats_mv (seconds)
+conversation_stats_refresh_interval = get_settings().conversation_stats_refresh_interval
+
+# Refresh interval for events_daily_rollup (seconds)
+events_rollup_refresh_interval = int(os.getenv("EVENTS_ROLLUP_REFRESH_INTERVAL", "300"))
+
 # Create Celery app
 celery_app = Celery(
     "training_platform",
@@ -19,6 +27,20 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
     result_expires=3600,
+    # Reuse broker/backend connections instead of reconnecting per task
+    broker_pool_limit=20,
+    broker_transport_options={"socket_keepalive": True},
+    redis_socket_keepalive=True,
+    beat_schedule={
+        "refresh-conversation-stats": {
+            "task": "api.tasks.celery_app.refresh_conversation_stats",
+            "schedule": conversation_stats_refresh_interval,
+        },
+        "refresh-events-daily-rollup": {
+            "task": "api.tasks.celery_app.refresh_events_daily_rollup",
+            "schedule": events_rollup_refresh_interval,
+        },
+    },
 )
 
 # Auto-discover tasks
@@ -28,3 +50,48 @@ celery_app.conf.update(
 def test_task():
     """Simple test task"""
     return "Celery is working!"
+
+
+@celery_app.task
+def refresh_conversation_stats():
+    """Refresh the conversation_stats_mv materialized view"""
+    from api.database.connection import SessionLocal
+    from api.services.conversation_service import refresh_conversation_stats as refresh
+
+    if not get_settings().conversation_stats_mv_enabled:
+        return "conversation_stats_mv disabled"
+
+    db = SessionLocal()
+    try:
+        refresh(db)
+        return "conversation_stats_mv refreshed"
+    finally:
+        db.close()
+
+
+@celery_app.task
+def refresh_events_daily_rollup():
+    """Recompute the recent (and any missing) days of events_daily_rollup"""
+    from api.database.connection import SessionLocal
+    from api.services.metrics_service import refresh_events_daily_rollup as refresh
+
+    db = SessionLocal()
+    try:
+        since_day = refresh(db)
+        return f"events_daily_rollup refreshed since {since_day}"
+    finally:
+        db.close()
+
+
+@celery_app.task
+def rebuild_events_daily_rollup():
+    """Rebuild events_daily_rollup from the oldest event (after imports/restores)"""
+    from api.database.connection import SessionLocal
+    from api.services.metrics_service import refresh_events_daily_rollup as refresh
+
+    db = SessionLocal()
+    try:
+        since_day = refresh(db, full=True)
+        return f"events_daily_rollup rebuilt since {since_day}"
+    finally:
+        db.close()
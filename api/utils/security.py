@@ -2,28 +2,52 @@
 Security utilities for authentication
 """
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Dict, Optional, Tuple
+import time
+import jwt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import bcrypt
 from api.config import get_settings
 
 settings = get_settings()
 
+# argon2id (OWASP minimum: 19 MiB memory, 2 iterations, 1 lane)
+password_hasher = PasswordHasher(memory_cost=19456, time_cost=2, parallelism=1)
+
+# Decoded access tokens: token -> (exp as Unix time, payload)
+_TOKEN_CACHE_MAX_SIZE = 1024
+_token_cache: Dict[str, Tuple[float, dict]] = {}
+
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    """Check if a hash was produced by the previous bcrypt scheme"""
+    return hashed_password.startswith(("$2a$", "$2b$", "$2y$"))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'),
-        hashed_password.encode('utf-8')
-    )
+    """Verify a password against a hash (argon2id, or legacy bcrypt)"""
+    if _is_bcrypt_hash(hashed_password):
+        # bcrypt has a 72 byte limit - hashes were created from the truncated password
+        return bcrypt.checkpw(
+            plain_password.encode('utf-8')[:72],
+            hashed_password.encode('utf-8')
+        )
+
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check if a hash should be upgraded (legacy bcrypt or outdated argon2 parameters)"""
+    return _is_bcrypt_hash(hashed_password) or password_hasher.check_needs_rehash(hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    # bcrypt has a 72 byte limit - truncate if necessary
-    password_bytes = password.encode('utf-8')[:72]
-    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
-    return hashed.decode('utf-8')
+    """Hash a password with argon2id"""
+    return password_hasher.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -42,9 +66,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify JWT access token"""
+    """
+    Decode and verify JWT access token
+
+    Successful decodes are memoized until the token's own expiry, so the
+    signature is checked once per token rather than once per request.
+    """
+    now = time.time()
+
+    cached = _token_cache.get(token)
+    if cached:
+        if cached[0] > now:
+            return dict(cached[1])
+        _token_cache.pop(token, None)
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
-    except JWTError:
+    except jwt.PyJWTError:
         return None
+
+    exp = payload.get("exp")
+    if exp is not None:
+        if len(_token_cache) >= _TOKEN_CACHE_MAX_SIZE:
+            # Evict expired entries; if still full, start over
+            for key, (expires_at, _) in list(_token_cache.items()):
+                if expires_at <= now:
+                    _token_cache.pop(key, None)
+            if len(_token_cache) >= _TOKEN_CACHE_MAX_SIZE:
+                _token_cache.clear()
+        _token_cache[token] = (float(exp), payload)
+
+    return dict(payload)
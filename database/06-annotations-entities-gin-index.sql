@@ -0,0 +1,32 @@
+-- ============================================
+-- MIGRATION: JSONB + GIN index on annotation entities
+-- ============================================
+-- Versión: 06
+-- Descripción: Asegura que las columnas de entities de annotations sean JSONB
+--              y añade índices GIN para consultas por contención (@>)
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen estos índices en init-platform-tables.sql
+
+BEGIN;
+
+-- 1. Convertir a JSONB (no-op si la columna ya es JSONB)
+ALTER TABLE annotations
+    ALTER COLUMN original_entities TYPE JSONB USING original_entities::jsonb,
+    ALTER COLUMN corrected_entities TYPE JSONB USING corrected_entities::jsonb;
+
+-- 2. Índices GIN con jsonb_path_ops (más pequeños, soportan @>)
+-- Ejemplo: SELECT id FROM annotations WHERE corrected_entities @> '[{"entity": "producto"}]';
+CREATE INDEX IF NOT EXISTS idx_annotations_original_entities_gin
+    ON annotations USING GIN (original_entities jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_annotations_corrected_entities_gin
+    ON annotations USING GIN (corrected_entities jsonb_path_ops);
+
+COMMIT;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP INDEX IF EXISTS idx_annotations_original_entities_gin;
+-- DROP INDEX IF EXISTS idx_annotations_corrected_entities_gin;
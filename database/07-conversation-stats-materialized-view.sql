@@ -0,0 +1,51 @@
+-- ============================================
+-- MIGRATION: conversation_stats materialized view
+-- ============================================
+-- Versión: 07
+-- Descripción: Crea conversation_stats_mv con los agregados por sender_id que
+--              antes se calculaban en un CTE en cada request de
+--              get_conversations_list / export_conversations_csv
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen la vista en init-platform-tables.sql
+
+BEGIN;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS conversation_stats_mv AS
+SELECT
+    e.sender_id,
+    COUNT(*) as msg_count,
+    MAX(e.timestamp) as last_timestamp,
+    AVG(CASE
+        WHEN e.data::jsonb->'parse_data'->'intent'->>'confidence' IS NOT NULL
+        THEN CAST(e.data::jsonb->'parse_data'->'intent'->>'confidence' AS FLOAT)
+        ELSE NULL
+    END) as avg_conf,
+    MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent,
+    MAX(CASE
+        WHEN e.type_name = 'user'
+        THEN e.data::jsonb->'parse_data'->>'text'
+        ELSE NULL
+    END) as last_user_msg
+FROM events e
+WHERE e.type_name = 'user'
+GROUP BY e.sender_id;
+
+-- Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversation_stats_mv_sender_id
+    ON conversation_stats_mv(sender_id);
+
+GRANT SELECT ON conversation_stats_mv TO rasa_user;
+
+COMMIT;
+
+-- ============================================
+-- REFRESH MANUAL
+-- ============================================
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY conversation_stats_mv;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP MATERIALIZED VIEW IF EXISTS conversation_stats_mv;
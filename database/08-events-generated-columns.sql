@@ -0,0 +1,58 @@
+-- ============================================
+-- MIGRATION: events generated columns
+-- ============================================
+-- Versión: 08
+-- Descripción: Añade columnas generadas intent_confidence y user_text a events
+--              para que las estadísticas por conversación no tengan que
+--              parsear data::jsonb fila por fila, más índices de soporte
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen estas columnas en init-db.sql
+-- NOTA: ADD COLUMN ... STORED reescribe la tabla events (bloqueo exclusivo);
+--       ejecutar en una ventana de mantenimiento si la tabla es grande.
+
+BEGIN;
+
+-- 1. Columnas generadas (data sigue siendo TEXT por compatibilidad con RASA)
+ALTER TABLE events
+    ADD COLUMN IF NOT EXISTS intent_confidence DOUBLE PRECISION
+        GENERATED ALWAYS AS ((data::jsonb #>> '{parse_data,intent,confidence}')::double precision) STORED,
+    ADD COLUMN IF NOT EXISTS user_text TEXT
+        GENERATED ALWAYS AS (data::jsonb #>> '{parse_data,text}') STORED;
+
+-- 2. Índices (user_text no va en INCLUDE: un mensaje largo superaría el
+--    límite de tamaño de la tupla btree y haría fallar el INSERT de RASA)
+CREATE INDEX IF NOT EXISTS idx_events_sender_type
+    ON events(sender_id, type_name) INCLUDE (intent_confidence);
+
+-- 3. Recrear conversation_stats_mv (migración 07) leyendo las columnas generadas
+DROP MATERIALIZED VIEW IF EXISTS conversation_stats_mv;
+
+CREATE MATERIALIZED VIEW conversation_stats_mv AS
+SELECT
+    e.sender_id,
+    COUNT(*) as msg_count,
+    MAX(e.timestamp) as last_timestamp,
+    AVG(e.intent_confidence) as avg_conf,
+    MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent,
+    MAX(CASE WHEN e.type_name = 'user' THEN e.user_text END) as last_user_msg
+FROM events e
+WHERE e.type_name = 'user'
+GROUP BY e.sender_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversation_stats_mv_sender_id
+    ON conversation_stats_mv(sender_id);
+
+GRANT SELECT ON conversation_stats_mv TO rasa_user;
+
+COMMIT;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- Recrear conversation_stats_mv con database/07-conversation-stats-materialized-view.sql
+-- después de eliminar las columnas:
+-- DROP MATERIALIZED VIEW IF EXISTS conversation_stats_mv;
+-- DROP INDEX IF EXISTS idx_events_sender_type;
+-- ALTER TABLE events DROP COLUMN IF EXISTS intent_confidence, DROP COLUMN IF EXISTS user_text;
@@ -0,0 +1,25 @@
+-- ============================================
+-- MIGRATION: conversation list indexes
+-- ============================================
+-- Versión: 09
+-- Descripción: Índice para el ORDER BY updated_at DESC del listado paginado
+--              de conversaciones e índice parcial de eventos 'user' para la
+--              agregación de conversation_stats
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen estos índices en init-db.sql
+-- NOTA: CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una
+--       transacción (sin BEGIN/COMMIT); no bloquea escrituras de RASA.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rasa_conversations_updated_at
+    ON rasa_conversations(updated_at DESC, sender_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_sender_user
+    ON events(sender_id) WHERE type_name = 'user';
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_rasa_conversations_updated_at;
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_events_sender_user;
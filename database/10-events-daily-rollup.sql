@@ -0,0 +1,54 @@
+-- ============================================
+-- MIGRATION: events_daily_rollup
+-- ============================================
+-- Versión: 10
+-- Descripción: Tabla de agregados diarios por intent de los eventos 'user'
+--              (conteo y suma de confianza) para las métricas del dashboard,
+--              con backfill de todo el histórico de events
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen la tabla en init-platform-tables.sql
+-- Después del backfill la tarea Celery refresh_events_daily_rollup mantiene
+-- actualizados los días recientes y rellena los que falten desde el último
+-- día del rollup; rebuild_events_daily_rollup lo reconstruye completo.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS events_daily_rollup (
+    day DATE NOT NULL,
+    intent_name VARCHAR(255) NOT NULL,
+    cnt BIGINT NOT NULL,
+    sum_conf DOUBLE PRECISION,
+    conf_cnt BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (day, intent_name)
+);
+
+-- Backfill
+INSERT INTO events_daily_rollup (day, intent_name, cnt, sum_conf, conf_cnt)
+SELECT
+    (to_timestamp(timestamp) AT TIME ZONE 'America/Guatemala')::date as day,
+    intent_name,
+    COUNT(*),
+    SUM(intent_confidence),
+    COUNT(intent_confidence)
+FROM events
+WHERE type_name = 'user'
+AND intent_name IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (day, intent_name) DO UPDATE
+SET
+    cnt = EXCLUDED.cnt,
+    sum_conf = EXCLUDED.sum_conf,
+    conf_cnt = EXCLUDED.conf_cnt,
+    updated_at = CURRENT_TIMESTAMP;
+
+GRANT ALL PRIVILEGES ON events_daily_rollup TO rasa_user;
+
+COMMIT;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP TABLE IF EXISTS events_daily_rollup;
@@ -0,0 +1,37 @@
+-- ============================================
+-- MIGRATION: events entity_count generated column
+-- ============================================
+-- Versión: 11
+-- Descripción: Añade la columna generada entity_count a events y un índice
+--              parcial por timestamp sobre eventos 'user' para que las
+--              métricas del dashboard no parseen data::jsonb
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen la columna en init-db.sql
+-- Requiere database/08-events-generated-columns.sql (intent_confidence)
+-- NOTA: ADD COLUMN ... STORED reescribe la tabla events (bloqueo exclusivo);
+--       ejecutar en una ventana de mantenimiento si la tabla es grande.
+
+BEGIN;
+
+ALTER TABLE events
+    ADD COLUMN IF NOT EXISTS entity_count INTEGER
+        GENERATED ALWAYS AS (CASE
+            WHEN jsonb_typeof(data::jsonb #> '{parse_data,entities}') = 'array'
+            THEN jsonb_array_length(data::jsonb #> '{parse_data,entities}')
+            ELSE 0
+        END) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_events_user_timestamp
+    ON events(timestamp)
+    INCLUDE (intent_name, intent_confidence, entity_count)
+    WHERE type_name = 'user';
+
+COMMIT;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP INDEX IF EXISTS idx_events_user_timestamp;
+-- ALTER TABLE events DROP COLUMN IF EXISTS entity_count;
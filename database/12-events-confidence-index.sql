@@ -0,0 +1,23 @@
+-- ============================================
+-- MIGRATION: events confidence index
+-- ============================================
+-- Versión: 12
+-- Descripción: Índice parcial (timestamp, intent_confidence) INCLUDE (sender_id)
+--              sobre eventos 'user' para el conteo de conversaciones con alta
+--              confianza del funnel (index-only scan en lugar de escaneo completo)
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen el índice en init-db.sql
+-- Requiere database/08-events-generated-columns.sql (intent_confidence)
+-- NOTA: CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_user_conf_ts
+    ON events(timestamp, intent_confidence)
+    INCLUDE (sender_id)
+    WHERE type_name = 'user';
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_events_user_conf_ts;
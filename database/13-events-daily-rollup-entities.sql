@@ -0,0 +1,40 @@
+-- ============================================
+-- MIGRATION: events_daily_rollup entity counts
+-- ============================================
+-- Versión: 13
+-- Descripción: Añade entity_cnt (eventos con al menos una entidad) a
+--              events_daily_rollup para que el resumen del dashboard lea
+--              del rollup en lugar de escanear events; backfill del histórico
+-- ============================================
+
+-- IMPORTANTE: Este script es para bases de datos EXISTENTES.
+-- Las nuevas instalaciones ya incluyen la columna en init-platform-tables.sql
+-- Requiere database/10-events-daily-rollup.sql y 11-events-entity-count.sql
+
+BEGIN;
+
+ALTER TABLE events_daily_rollup
+    ADD COLUMN IF NOT EXISTS entity_cnt BIGINT NOT NULL DEFAULT 0;
+
+-- Backfill
+UPDATE events_daily_rollup r
+SET entity_cnt = s.entity_cnt
+FROM (
+    SELECT
+        (to_timestamp(timestamp) AT TIME ZONE 'America/Guatemala')::date as day,
+        intent_name,
+        COUNT(*) FILTER (WHERE entity_count > 0) as entity_cnt
+    FROM events
+    WHERE type_name = 'user'
+    AND intent_name IS NOT NULL
+    GROUP BY 1, 2
+) s
+WHERE r.day = s.day
+AND r.intent_name = s.intent_name;
+
+COMMIT;
+
+-- ============================================
+-- ROLLBACK (si es necesario)
+-- ============================================
+-- ALTER TABLE events_daily_rollup DROP COLUMN IF EXISTS entity_cnt;
@@ -97,6 +97,11 @@ CREATE INDEX idx_annotations_corrected_intent ON annotations(corrected_intent);
 CREATE INDEX idx_annotations_approved_by ON annotations(approved_by);
 CREATE INDEX idx_annotations_approved_at ON annotations(approved_at DESC);
 
+-- Índices GIN (jsonb_path_ops) para búsquedas por contención sobre entities,
+-- ej: WHERE corrected_entities @> '[{"entity": "producto"}]'
+CREATE INDEX idx_annotations_original_entities_gin ON annotations USING GIN (original_entities jsonb_path_ops);
+CREATE INDEX idx_annotations_corrected_entities_gin ON annotations USING GIN (corrected_entities jsonb_path_ops);
+
 -- ============================================
 -- TABLA: training_jobs
 -- Descripción: Registro de entrenamientos del modelo
@@ -351,6 +356,25 @@ ALTER TABLE annotations
     REFERENCES training_jobs(id)
     ON DELETE SET NULL;
 
+-- ============================================
+-- TABLA: events_daily_rollup
+-- Descripción: Agregados diarios de eventos 'user' por intent (día en hora de
+-- Guatemala). Las métricas del dashboard leen de aquí en lugar de escanear
+-- events. Se mantiene con la tarea Celery refresh_events_daily_rollup, que
+-- recalcula los días recientes y los que falten desde el último día del
+-- rollup; rebuild_events_daily_rollup lo reconstruye completo.
+-- ============================================
+CREATE TABLE IF NOT EXISTS events_daily_rollup (
+    day DATE NOT NULL,
+    intent_name VARCHAR(255) NOT NULL,
+    cnt BIGINT NOT NULL,                -- eventos 'user' del día con ese intent
+    sum_conf DOUBLE PRECISION,          -- suma de intent_confidence
+    conf_cnt BIGINT NOT NULL,           -- eventos con intent_confidence no nulo
+    entity_cnt BIGINT NOT NULL DEFAULT 0, -- eventos con al menos una entidad
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (day, intent_name)
+);
+
 -- ============================================
 -- VISTAS ÚTILES
 -- ============================================
@@ -421,6 +445,30 @@ LEFT JOIN annotations a ON u.id = a.annotated_by
 WHERE u.is_active = true
 GROUP BY u.id, u.username;
 
+-- ============================================
+-- VISTA MATERIALIZADA: conversation_stats_mv
+-- Descripción: Agregados por sender_id sobre los eventos 'user' de RASA
+-- (mensajes, confianza promedio, intent principal, último mensaje).
+-- El listado y la exportación de conversaciones hacen JOIN contra esta vista
+-- en lugar de re-agregar toda la tabla events en cada request.
+-- Se refresca periódicamente (tarea Celery refresh_conversation_stats).
+-- ============================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS conversation_stats_mv AS
+SELECT
+    e.sender_id,
+    COUNT(*) as msg_count,
+    MAX(e.timestamp) as last_timestamp,
+    AVG(e.intent_confidence) as avg_conf,
+    MODE() WITHIN GROUP (ORDER BY e.intent_name) as primary_intent,
+    MAX(CASE WHEN e.type_name = 'user' THEN e.user_text END) as last_user_msg
+FROM events e
+WHERE e.type_name = 'user'
+GROUP BY e.sender_id;
+
+-- Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversation_stats_mv_sender_id
+    ON conversation_stats_mv(sender_id);
+
 -- ============================================
 -- FUNCIONES ÚTILES
 -- ============================================
@@ -462,6 +510,7 @@ COMMENT ON TABLE activity_logs IS 'Logs de auditoría de todas las actividades d
 COMMENT ON TABLE test_cases IS 'Casos de prueba para validación del modelo';
 COMMENT ON TABLE test_results IS 'Resultados de ejecución de test cases';
 COMMENT ON TABLE conversation_reviews IS 'Seguimiento de conversaciones revisadas por QA';
+COMMENT ON TABLE events_daily_rollup IS 'Agregados diarios por intent de eventos RASA para el dashboard';
 
 -- ============================================
 -- DATOS INICIALES
@@ -133,7 +133,20 @@ CREATE TABLE IF NOT EXISTS events (
     timestamp DOUBLE PRECISION,
     intent_name VARCHAR(255),
     action_name VARCHAR(255),
-    data TEXT
+    data TEXT,
+    -- Columnas generadas: evitan parsear data::jsonb en cada agregación
+    -- Ver: database/08-events-generated-columns.sql y 11-events-entity-count.sql
+    intent_confidence DOUBLE PRECISION
+        GENERATED ALWAYS AS ((data::jsonb #>> '{parse_data,intent,confidence}')::double precision) STORED,
+    user_text TEXT
+        GENERATED ALWAYS AS (data::jsonb #>> '{parse_data,text}') STORED,
+    -- jsonb_typeof: parse_data.entities puede ser JSON null (no SQL NULL)
+    entity_count INTEGER
+        GENERATED ALWAYS AS (CASE
+            WHEN jsonb_typeof(data::jsonb #> '{parse_data,entities}') = 'array'
+            THEN jsonb_array_length(data::jsonb #> '{parse_data,entities}')
+            ELSE 0
+        END) STORED
 );
 
 -- Tabla para logging de conversaciones
@@ -186,8 +199,22 @@ CREATE INDEX idx_order_details_product_id ON order_details(product_id);
 -- Índices para RASA
 CREATE INDEX idx_events_sender_id ON events(sender_id);
 CREATE INDEX idx_events_timestamp ON events(timestamp);
+-- Índice cubriente para las estadísticas por conversación (conversation_stats)
+-- Sin user_text en INCLUDE: un mensaje largo superaría el límite de tamaño
+-- de la tupla btree y haría fallar el INSERT de RASA en events
+CREATE INDEX idx_events_sender_type ON events(sender_id, type_name) INCLUDE (intent_confidence);
+-- Índice parcial sobre eventos de usuario (agregación de conversation_stats)
+CREATE INDEX idx_events_sender_user ON events(sender_id) WHERE type_name = 'user';
+-- Índice parcial por timestamp para las métricas del dashboard (index-only scans)
+CREATE INDEX idx_events_user_timestamp ON events(timestamp)
+    INCLUDE (intent_name, intent_confidence, entity_count) WHERE type_name = 'user';
+-- Conteo de conversaciones con alta confianza (funnel): index-only scan
+CREATE INDEX idx_events_user_conf_ts ON events(timestamp, intent_confidence)
+    INCLUDE (sender_id) WHERE type_name = 'user';
 CREATE INDEX idx_rasa_conversations_sender_id ON rasa_conversations(sender_id);
 CREATE INDEX idx_rasa_conversations_customer_id ON rasa_conversations(customer_id);
+-- Listado paginado de conversaciones (ORDER BY updated_at DESC LIMIT/OFFSET)
+CREATE INDEX idx_rasa_conversations_updated_at ON rasa_conversations(updated_at DESC, sender_id DESC);
 CREATE INDEX idx_conversaciones_session_id ON conversaciones_chatbot(session_id);
 CREATE INDEX idx_conversaciones_intent ON conversaciones_chatbot(intent_detected);
 
@@ -8,14 +8,18 @@ This creates realistic conversations with multiple intents to test:
 - Confidence scores
 - Conversation flows
 """
-import requests
-import time
-import random
+import asyncio
 from datetime import datetime
 
+import httpx
+
 # RASA API endpoint
 RASA_URL = "http://localhost:5005/webhooks/rest/webhook"
 
+# Conversations in flight at once. Messages within a conversation stay
+# sequential so RASA's tracker sees them in order.
+MAX_CONCURRENT_CONVERSATIONS = 5
+
 # Test conversations with different intents
 CONVERSATIONS = [
     {
@@ -117,11 +121,12 @@ CONVERSATIONS = [
 ]
 
 
-def send_message(sender_id: str, message: str) -> dict:
+async def send_message(client: httpx.AsyncClient, sender_id: str, message: str) -> list:
     """
     Send a message to RASA and return the response
 
     Args:
+        client: Shared HTTP client (keep-alive connection pool)
         sender_id: Unique identifier for the conversation
         message: Text message to send
 
@@ -129,53 +134,64 @@ def send_message(sender_id: str, message: str) -> dict:
         API response
     """
     try:
-        response = requests.post(
+        response = await client.post(
             RASA_URL,
-            json={"sender": sender_id, "message": message},
-            timeout=10
+            json={"sender": sender_id, "message": message}
         )
         response.raise_for_status()
         return response.json()
-    except Exception as e:
-        print(f"   ❌ Error sending message: {e}")
+    except httpx.HTTPError as e:
+        print(f"   ❌ [{sender_id}] Error sending message: {e}")
         return []
 
 
-def run_conversation(conversation: dict, delay: float = 1.5):
+async def run_conversation(
+    client: httpx.AsyncClient,
+    conversation: dict,
+    semaphore: asyncio.Semaphore,
+    delay: float = 1.5
+):
     """
     Run a complete conversation with RASA
 
+    Output is buffered and printed once the conversation finishes so lines
+    from concurrent conversations don't interleave.
+
     Args:
+        client: Shared HTTP client
         conversation: Dict with sender and messages
+        semaphore: Limits how many conversations run at once
         delay: Delay between messages in seconds
     """
     sender = conversation["sender"]
     messages = conversation["messages"]
+    lines = [
+        f"\n🗣️  Conversation for {sender}",
+        f"   📝 {len(messages)} messages to send",
+    ]
 
-    print(f"\n🗣️  Starting conversation for {sender}")
-    print(f"   📝 {len(messages)} messages to send")
+    async with semaphore:
+        for i, message in enumerate(messages, 1):
+            lines.append(f"   [{i}/{len(messages)}] User: {message}")
 
-    for i, message in enumerate(messages, 1):
-        print(f"   [{i}/{len(messages)}] User: {message}")
+            responses = await send_message(client, sender, message)
 
-        responses = send_message(sender, message)
-
-        if responses:
             for resp in responses:
                 text = resp.get("text", "")
                 # Truncate long responses
                 if len(text) > 100:
                     text = text[:97] + "..."
-                print(f"   ↳ Bot: {text}")
+                lines.append(f"   ↳ Bot: {text}")
 
-        # Wait between messages to simulate real conversation
-        if i < len(messages):
-            time.sleep(delay)
+            # Wait between messages to simulate real conversation
+            if i < len(messages):
+                await asyncio.sleep(delay)
 
-    print(f"   ✅ Conversation completed for {sender}")
+    lines.append(f"   ✅ Conversation completed for {sender}")
+    print("\n".join(lines))
 
 
-def main():
+async def main():
     """Main execution"""
     print("=" * 70)
     print("🤖 RASA Test Conversation Generator")
@@ -183,26 +199,31 @@ def main():
     print(f"\n📊 Generating {len(CONVERSATIONS)} test conversations")
     print(f"🎯 Target intents: saludar, consultar_catalogo, agregar_al_carrito,")
     print(f"                  consultar_envios, consultar_pagos, despedir")
+    print(f"🔀 Running up to {MAX_CONCURRENT_CONVERSATIONS} conversations concurrently")
     print(f"⏰ Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
-    success_count = 0
-    error_count = 0
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONVERSATIONS)
+    limits = httpx.Limits(
+        max_connections=MAX_CONCURRENT_CONVERSATIONS,
+        max_keepalive_connections=MAX_CONCURRENT_CONVERSATIONS
+    )
 
-    for i, conversation in enumerate(CONVERSATIONS, 1):
-        print(f"\n{'─' * 70}")
-        print(f"Conversation {i}/{len(CONVERSATIONS)}")
+    # Retry failed connection attempts (e.g. RASA still loading the model)
+    transport = httpx.AsyncHTTPTransport(retries=2, limits=limits)
 
-        try:
-            run_conversation(conversation, delay=1.0)
-            success_count += 1
-        except Exception as e:
-            print(f"   ❌ Error in conversation: {e}")
-            error_count += 1
+    async with httpx.AsyncClient(timeout=10, transport=transport) as client:
+        results = await asyncio.gather(
+            *(run_conversation(client, c, semaphore, delay=1.0) for c in CONVERSATIONS),
+            return_exceptions=True
+        )
 
-        # Small delay between conversations
-        if i < len(CONVERSATIONS):
-            time.sleep(0.5)
+    error_count = 0
+    for conversation, result in zip(CONVERSATIONS, results):
+        if isinstance(result, Exception):
+            print(f"   ❌ Error in conversation {conversation['sender']}: {result}")
+            error_count += 1
+    success_count = len(CONVERSATIONS) - error_count
 
     print(f"\n{'=' * 70}")
     print("📈 Summary")
@@ -220,4 +241,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -6,14 +6,42 @@ import sys
 import os
 from datetime import datetime, timedelta
 import random
-import json
+import csv
+import io
+
+import orjson
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from api.config import get_settings
 from api.database.connection import SessionLocal
+from api.services.conversation_service import refresh_conversation_stats
+from api.services.metrics_service import GUATEMALA_TZ, refresh_events_daily_rollup
 from sqlalchemy import text
 
+# Seeded events go back this many days (plus up to 23 hours)
+SEED_DAYS = 30
+
+
+def copy_rows(cursor, table: str, columns: list, rows: list):
+    """
+    Bulk-load rows with COPY FROM STDIN (CSV)
+
+    Args:
+        cursor: Raw psycopg2 cursor
+        table: Target table
+        columns: Column names, in the same order as each row
+        rows: Row tuples (None is loaded as NULL)
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
 
 def seed_rasa_conversations():
     """Seed rasa_conversations table with sample data"""
@@ -32,19 +60,29 @@ def seed_rasa_conversations():
 
             sample_data.append({
                 'sender_id': f'user_{random.randint(1, 50)}',
-                'timestamp': timestamp,
-                'message_count': random.randint(1, 20),
-                'status': random.choice(['resolved', 'pending', 'escalated']),
-                'needs_review': random.choice([True, False])
+                'created_at': timestamp,
+                'updated_at': timestamp + timedelta(minutes=random.randint(1, 30)),
+                'active': random.choice([True, False])
             })
 
-        # Insert data
-        for data in sample_data:
-            db.execute(text("""
-                INSERT INTO rasa_conversations (sender_id, timestamp, message_count, status, needs_review)
-                VALUES (:sender_id, :timestamp, :message_count, :status, :needs_review)
+        # COPY into a staging table, then one INSERT ... SELECT
+        # (COPY has no ON CONFLICT, and sender_id is unique)
+        with db.connection().connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE seed_rasa_conversations
+                (LIKE rasa_conversations INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+            copy_rows(cursor, "seed_rasa_conversations", ["sender_id", "events", "created_at", "updated_at", "active"], [
+                (d['sender_id'], '[]', d['created_at'], d['updated_at'], d['active'])
+                for d in sample_data
+            ])
+            cursor.execute("""
+                INSERT INTO rasa_conversations (sender_id, events, created_at, updated_at, active)
+                SELECT sender_id, events, created_at, updated_at, active
+                FROM seed_rasa_conversations
                 ON CONFLICT DO NOTHING
-            """), data)
+            """)
 
         db.commit()
         print(f"✅ Inserted {len(sample_data)} conversations")
@@ -79,43 +117,47 @@ def seed_events():
 
         base_date = datetime.utcnow()
 
-        sample_events = []
-        for i in range(200):
-            days_ago = random.randint(0, 30)
-            timestamp = base_date - timedelta(days=days_ago, hours=random.randint(0, 23))
-
-            intent = random.choice(intents)
-            confidence = random.uniform(0.5, 0.99)
-
-            event_data = {
-                'parse_data': {
-                    'intent': {
-                        'name': intent,
-                        'confidence': confidence
-                    },
-                    'intent_ranking': [{
-                        'name': intent,
-                        'confidence': confidence
-                    }],
-                    'entities': random.choice([[], entities_examples[:random.randint(1, 2)]])
-                }
-            }
-
-            sample_events.append({
-                'sender_id': f'user_{random.randint(1, 50)}',
+        # Draw each column in one call, then zip into rows
+        n = 200
+        senders = random.choices(range(1, 51), k=n)
+        days_ago = random.choices(range(0, SEED_DAYS + 1), k=n)
+        hours = random.choices(range(0, 24), k=n)
+        intent_column = random.choices(intents, k=n)
+        confidences = [random.uniform(0.5, 0.99) for _ in range(n)]
+        # Half without entities, a quarter with one, a quarter with two
+        entity_counts = random.choices([0, 1, 2], weights=[2, 1, 1], k=n)
+
+        sample_events = [
+            {
+                'sender_id': f'user_{sender}',
                 'type_name': 'user',
-                'timestamp': timestamp,
+                'timestamp': (base_date - timedelta(days=days, hours=hour)).timestamp(),
                 'intent_name': intent,
                 'action_name': None,
-                'data': json.dumps(event_data)
-            })
+                'data': orjson.dumps({
+                    'parse_data': {
+                        'intent': {
+                            'name': intent,
+                            'confidence': confidence
+                        },
+                        'intent_ranking': [{
+                            'name': intent,
+                            'confidence': confidence
+                        }],
+                        'entities': entities_examples[:entity_count]
+                    }
+                }).decode()
+            }
+            for sender, days, hour, intent, confidence, entity_count
+            in zip(senders, days_ago, hours, intent_column, confidences, entity_counts)
+        ]
 
-        # Insert events
-        for event in sample_events:
-            db.execute(text("""
-                INSERT INTO events (sender_id, type_name, timestamp, intent_name, action_name, data)
-                VALUES (:sender_id, :type_name, :timestamp, :intent_name, :action_name, CAST(:data AS jsonb))
-            """), event)
+        # Insert events (COPY: no per-row parsing, one round trip)
+        with db.connection().connection.cursor() as cursor:
+            copy_rows(cursor, "events", ["sender_id", "type_name", "timestamp", "intent_name", "action_name", "data"], [
+                (e['sender_id'], e['type_name'], e['timestamp'], e['intent_name'], e['action_name'], e['data'])
+                for e in sample_events
+            ])
 
         db.commit()
         print(f"✅ Inserted {len(sample_events)} events")
@@ -130,6 +172,35 @@ def seed_events():
         db.close()
 
 
+def refresh_derived_tables():
+    """
+    Refresh events_daily_rollup and conversation_stats_mv for the seeded data
+
+    Both are normally kept up to date by Celery beat, which only picks up
+    recent days; without this the dashboard and the conversation list stay
+    empty for the seeded history.
+    """
+    db = SessionLocal()
+
+    try:
+        print("🔄 Refreshing events_daily_rollup...")
+        since_day = (datetime.now(GUATEMALA_TZ) - timedelta(days=SEED_DAYS + 1)).date()
+        refresh_events_daily_rollup(db, since_day=since_day)
+        print(f"✅ events_daily_rollup refreshed since {since_day}")
+
+        if get_settings().conversation_stats_mv_enabled:
+            print("🔄 Refreshing conversation_stats_mv...")
+            refresh_conversation_stats(db)
+            print("✅ conversation_stats_mv refreshed")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error refreshing derived tables: {e}")
+
+    finally:
+        db.close()
+
+
 def seed_deployed_models():
     """Seed deployed_models table"""
     db = SessionLocal()
@@ -146,10 +217,10 @@ def seed_deployed_models():
             'accuracy': 0.87,
             'f1_score': 0.85,
             'is_active': True,
-            'training_config': json.dumps({
+            'training_config': orjson.dumps({
                 'pipeline': 'supervised',
                 'epochs': 100
-            })
+            }).decode()
         }
 
         db.execute(text("""
@@ -177,6 +248,7 @@ if __name__ == "__main__":
 
     seed_rasa_conversations()
     seed_events()
+    refresh_derived_tables()
     seed_deployed_models()
 
     print()
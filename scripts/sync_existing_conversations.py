@@ -9,11 +9,14 @@ This script:
 4. Links to customer_id if available
 
 Run this after applying the trigger SQL migration to backfill existing data.
+
+The whole sync runs in one transaction with synchronous_commit = OFF, so the
+commit doesn't wait for the WAL flush. If the server crashes right after the
+commit the backfill may be lost (never half-applied); just run it again.
 """
 import sys
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, Tuple
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -21,180 +24,148 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from sqlalchemy import text
 from api.database.connection import SessionLocal
 
+# Rows per server-side cursor fetch for the --verbose sender summary
+STATS_FETCH_SIZE = 5000
+
 
-def get_sender_stats_from_events(db) -> List[Dict]:
+def iter_sender_stats_from_events(db) -> Iterator[Dict]:
     """
-    Get statistics for each sender_id from events table
+    Stream statistics for each sender_id from events table
 
-    Returns:
-        List of dicts with sender_id, first_event, last_event, event_count
+    Rows are fetched through a server-side cursor STATS_FETCH_SIZE at a
+    time, so memory stays constant regardless of the number of senders.
+
+    The customer is matched by phone number in the same query
+    (Telegram IDs are numeric, so sender_id is only compared to phone).
+    first_event/last_event are converted to datetimes in SQL.
+
+    Yields:
+        Dicts with sender_id, first_event, last_event, event_count,
+        user_messages, customer_id
     """
     query = text("""
         SELECT
-            sender_id,
-            MIN(timestamp) as first_event,
-            MAX(timestamp) as last_event,
+            e.sender_id,
+            to_timestamp(MIN(e.timestamp))::timestamp as first_event,
+            to_timestamp(MAX(e.timestamp))::timestamp as last_event,
             COUNT(*) as event_count,
-            COUNT(CASE WHEN type_name = 'user' THEN 1 END) as user_messages
-        FROM events
-        GROUP BY sender_id
+            COUNT(*) FILTER (WHERE e.type_name = 'user') as user_messages,
+            MAX(c.id) as customer_id
+        FROM events e
+        LEFT JOIN customers c ON c.phone = e.sender_id
+        GROUP BY e.sender_id
         ORDER BY first_event DESC
     """)
 
-    result = db.execute(query).fetchall()
+    result = db.execute(query.execution_options(yield_per=STATS_FETCH_SIZE))
 
-    return [
-        {
+    for row in result:
+        yield {
             'sender_id': row[0],
             'first_event': row[1],
             'last_event': row[2],
             'event_count': row[3],
-            'user_messages': row[4]
+            'user_messages': row[4],
+            'customer_id': row[5]
         }
-        for row in result
-    ]
 
 
-def get_customer_id_for_sender(db, sender_id: str) -> Optional[int]:
+def sync_all_sql(db) -> Tuple[int, int]:
     """
-    Try to find customer_id for sender_id
-
-    Args:
-        db: Database session
-        sender_id: Sender ID to look up
-
-    Returns:
-        customer_id if found, None otherwise
-    """
-    # Try to match by phone number only
-    # Telegram IDs are numeric, so we only check if sender_id matches phone
-    query = text("""
-        SELECT id
-        FROM customers
-        WHERE phone = :sender_id
-        LIMIT 1
-    """)
+    Create/update every conversation in rasa_conversations server-side
 
-    result = db.execute(query, {'sender_id': sender_id}).fetchone()
-    return result[0] if result else None
-
-
-def sync_conversation(db, sender_data: Dict) -> bool:
-    """
-    Sync a single conversation to rasa_conversations
+    A single INSERT ... SELECT aggregates events per sender and upserts
+    the result, so no rows travel through Python.
 
     Args:
         db: Database session
-        sender_data: Dict with sender statistics
 
     Returns:
-        True if successful, False otherwise
+        Tuple of (created, updated) conversation counts
     """
-    sender_id = sender_data['sender_id']
-    created_at = datetime.fromtimestamp(sender_data['first_event'])
-    updated_at = datetime.fromtimestamp(sender_data['last_event'])
-
-    # Try to find customer_id
-    customer_id = get_customer_id_for_sender(db, sender_id)
-
-    # Check if conversation already exists
-    check_query = text("""
-        SELECT COUNT(*) FROM rasa_conversations WHERE sender_id = :sender_id
-    """)
-    exists = db.execute(check_query, {'sender_id': sender_id}).fetchone()[0] > 0
-
-    if exists:
-        # Update existing
-        update_query = text("""
-            UPDATE rasa_conversations
-            SET
-                customer_id = :customer_id,
-                created_at = LEAST(created_at, :created_at),
-                updated_at = GREATEST(updated_at, :updated_at),
-                active = true
-            WHERE sender_id = :sender_id
-        """)
-
-        db.execute(update_query, {
-            'sender_id': sender_id,
-            'customer_id': customer_id,
-            'created_at': created_at,
-            'updated_at': updated_at
-        })
-
-        return True
-    else:
-        # Insert new
-        insert_query = text("""
+    # xmax = 0 only for freshly inserted rows, so the same statement
+    # tells created from updated
+    result = db.execute(text("""
+        WITH upserted AS (
             INSERT INTO rasa_conversations (
                 sender_id, customer_id, events, created_at, updated_at, active
             )
-            VALUES (
-                :sender_id, :customer_id, '[]', :created_at, :updated_at, true
-            )
-        """)
-
-        db.execute(insert_query, {
-            'sender_id': sender_id,
-            'customer_id': customer_id,
-            'created_at': created_at,
-            'updated_at': updated_at
-        })
+            SELECT
+                e.sender_id,
+                MAX(c.id),
+                '[]',
+                to_timestamp(MIN(e.timestamp)),
+                to_timestamp(MAX(e.timestamp)),
+                true
+            FROM events e
+            LEFT JOIN customers c ON c.phone = e.sender_id
+            GROUP BY e.sender_id
+            ON CONFLICT (sender_id) DO UPDATE
+            SET
+                customer_id = EXCLUDED.customer_id,
+                created_at = LEAST(rasa_conversations.created_at, EXCLUDED.created_at),
+                updated_at = GREATEST(rasa_conversations.updated_at, EXCLUDED.updated_at),
+                active = true
+            RETURNING (xmax = 0) as inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """)).fetchone()
 
-        return True
+    return result[0], result[1]
 
 
-def main():
-    """Main execution function"""
-    print("🔄 Starting rasa_conversations sync from events table...")
+def print_sender_summary(db):
+    """Print per-sender event statistics (only with --verbose)"""
+    print("📊 Analyzing events table...")
     print()
 
-    db = SessionLocal()
+    print("📋 Sender Summary:")
+    print(f"{'Sender ID':<20} {'Events':<10} {'User Msgs':<12} {'First Event':<20} {'Last Event':<20}")
+    print("-" * 90)
 
-    try:
-        # Get all sender stats from events
-        print("📊 Analyzing events table...")
-        sender_stats = get_sender_stats_from_events(db)
+    sender_count = 0
+    for stats in iter_sender_stats_from_events(db):
+        first = stats['first_event'].strftime('%Y-%m-%d %H:%M:%S')
+        last = stats['last_event'].strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{stats['sender_id']:<20} {stats['event_count']:<10} {stats['user_messages']:<12} {first:<20} {last:<20}")
+        sender_count += 1
 
-        if not sender_stats:
-            print("⚠️  No events found in database. Nothing to sync.")
-            return
+    print()
+    print(f"✅ Found {sender_count} unique senders in events table")
+    print()
 
-        print(f"✅ Found {len(sender_stats)} unique senders in events table")
-        print()
 
-        # Display summary
-        print("📋 Sender Summary:")
-        print(f"{'Sender ID':<20} {'Events':<10} {'User Msgs':<12} {'First Event':<20} {'Last Event':<20}")
-        print("-" * 90)
+def main(verbose: bool = False):
+    """
+    Main execution function
 
-        for stats in sender_stats:
-            first = datetime.fromtimestamp(stats['first_event']).strftime('%Y-%m-%d %H:%M:%S')
-            last = datetime.fromtimestamp(stats['last_event']).strftime('%Y-%m-%d %H:%M:%S')
-            print(f"{stats['sender_id']:<20} {stats['event_count']:<10} {stats['user_messages']:<12} {first:<20} {last:<20}")
+    Args:
+        verbose: Print the per-sender summary before syncing
+    """
+    print("🔄 Starting rasa_conversations sync from events table...")
+    print()
 
-        print()
-        print(f"🔄 Syncing {len(sender_stats)} conversations...")
+    db = SessionLocal()
 
-        # Sync each conversation
-        synced_count = 0
-        updated_count = 0
+    try:
+        # Single transaction: SET LOCAL lasts until the commit below
+        db.execute(text("SET LOCAL synchronous_commit = OFF"))
 
-        for stats in sender_stats:
-            # Check if exists before sync
-            check_query = text("""
-                SELECT COUNT(*) FROM rasa_conversations WHERE sender_id = :sender_id
-            """)
-            existed = db.execute(check_query, {'sender_id': stats['sender_id']}).fetchone()[0] > 0
+        if verbose:
+            print_sender_summary(db)
 
-            if sync_conversation(db, stats):
-                if existed:
-                    updated_count += 1
-                else:
-                    synced_count += 1
+        print("🔄 Syncing conversations...")
+        synced_count, updated_count = sync_all_sql(db)
 
         db.commit()
 
+        if synced_count + updated_count == 0:
+            print("⚠️  No events found in database. Nothing to sync.")
+            return
+
         print()
         print("✅ Sync completed successfully!")
         print(f"   📝 Created: {synced_count} new conversations")
@@ -221,4 +192,11 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill rasa_conversations from the events table")
+    parser.add_argument("--verbose", action="store_true", help="Print per-sender statistics before syncing")
+
+    args = parser.parse_args()
+
+    main(verbose=args.verbose)
@@ -9,10 +9,14 @@ import logging
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 import aiohttp
+import orjson
 
 # Configuración desde variables de entorno
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 RASA_URL = os.getenv("RASA_URL")
+# Si es true, las respuestas de RASA se envían una tras otra (orden garantizado);
+# por defecto se envían en paralelo
+TELEGRAM_ORDERED_REPLIES = os.getenv("TELEGRAM_ORDERED_REPLIES", "false").lower() == "true"
 
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN no está configurado en las variables de entorno")
@@ -28,7 +32,7 @@ bot = Bot(token=TELEGRAM_TOKEN)
 dp = Dispatcher()
 
 
-async def send_message_to_rasa(sender_id: str, message: str):
+async def send_message_to_rasa(http: aiohttp.ClientSession, sender_id: str, message: str):
     """Envía mensaje a RASA y obtiene respuesta"""
     payload = {
         "sender": sender_id,
@@ -36,34 +40,47 @@ async def send_message_to_rasa(sender_id: str, message: str):
     }
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(RASA_URL, json=payload) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    logger.error(f"Error de RASA: {response.status}")
-                    return []
+        async with http.post(RASA_URL, json=payload) as response:
+            if response.status == 200:
+                return await response.json(loads=orjson.loads)
+            else:
+                logger.error(f"Error de RASA: {response.status}")
+                return []
     except Exception as e:
         logger.error(f"Error conectando con RASA: {e}")
         return []
 
 
+async def send_responses(message: types.Message, responses: list):
+    """Envía las respuestas de RASA al usuario (en paralelo salvo TELEGRAM_ORDERED_REPLIES)"""
+    replies = [
+        message.answer(response["text"]) if "text" in response
+        else message.answer_photo(response["image"])
+        for response in responses
+        if "text" in response or "image" in response
+    ]
+
+    if TELEGRAM_ORDERED_REPLIES:
+        for reply in replies:
+            await reply
+    else:
+        await asyncio.gather(*replies)
+
+
 @dp.message(Command("start"))
-async def cmd_start(message: types.Message):
+async def cmd_start(message: types.Message, http: aiohttp.ClientSession):
     """Maneja el comando /start"""
     sender_id = str(message.from_user.id)
-    responses = await send_message_to_rasa(sender_id, "/start")
+    responses = await send_message_to_rasa(http, sender_id, "/start")
 
     if not responses:
         await message.answer("¡Hola! Soy tu asistente de ventas. ¿En qué puedo ayudarte?")
     else:
-        for response in responses:
-            if "text" in response:
-                await message.answer(response["text"])
+        await send_responses(message, responses)
 
 
 @dp.message()
-async def handle_message(message: types.Message):
+async def handle_message(message: types.Message, http: aiohttp.ClientSession):
     """Maneja todos los mensajes de texto"""
     sender_id = str(message.from_user.id)
     user_message = message.text
@@ -71,17 +88,13 @@ async def handle_message(message: types.Message):
     logger.info(f"Usuario {sender_id}: {user_message}")
 
     # Enviar mensaje a RASA
-    responses = await send_message_to_rasa(sender_id, user_message)
+    responses = await send_message_to_rasa(http, sender_id, user_message)
 
     # Enviar respuestas al usuario
     if not responses:
         await message.answer("Lo siento, hubo un problema. Por favor intenta de nuevo.")
     else:
-        for response in responses:
-            if "text" in response:
-                await message.answer(response["text"])
-            elif "image" in response:
-                await message.answer_photo(response["image"])
+        await send_responses(message, responses)
 
 
 async def main():
@@ -92,8 +105,19 @@ async def main():
     # Eliminar webhook si existe
     await bot.delete_webhook(drop_pending_updates=True)
 
-    # Iniciar polling
-    await dp.start_polling(bot)
+    # Una sola sesión HTTP (pool keep-alive) para todos los mensajes;
+    # aiogram la inyecta en los handlers como argumento "http"
+    http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30),
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    )
+    dp["http"] = http
+
+    try:
+        # Iniciar polling
+        await dp.start_polling(bot)
+    finally:
+        await http.close()
 
 
 if __name__ == "__main__":
@@ -29,6 +29,18 @@ require_auth()
 user = get_current_user()
 api_client = st.session_state.api_client
 
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_metrics(_api_client: APIClient, username: str, endpoint: str, days: int):
+    """
+    Fetch a metrics endpoint, cached for 60s per (user, endpoint, days)
+
+    _api_client is excluded from the cache key (leading underscore), so the
+    username keeps cached results per user.
+    """
+    return _api_client._make_request("GET", f"/api/v1/metrics/{endpoint}?days={days}")
+
+
 # Title
 st.title("📊 Dashboard de Métricas")
 st.markdown("---")
@@ -43,17 +55,19 @@ with st.sidebar:
         index=0
     )
 
-    if st.button("🔄 Actualizar", use_container_width=True):
+    if st.button("🔄 Forzar recarga", use_container_width=True):
+        load_metrics.clear()
         st.rerun()
 
 # Fetch metrics data
 try:
     with st.spinner("Cargando métricas..."):
-        summary = api_client._make_request("GET", f"/api/v1/metrics/summary?days={days_filter}")
-        timeline = api_client._make_request("GET", f"/api/v1/metrics/timeline?days=30")
-        intents = api_client._make_request("GET", f"/api/v1/metrics/intents?days={days_filter}")
-        heatmap_data = api_client._make_request("GET", f"/api/v1/metrics/heatmap?days={days_filter}")
-        funnel = api_client._make_request("GET", f"/api/v1/metrics/funnel?days={days_filter}")
+        # Single request for all metrics (timeline is always 30 days)
+        dashboard = load_metrics(api_client, user['username'], "dashboard", days_filter)
+        summary = dashboard["summary"]
+        timeline = dashboard["timeline"]
+        heatmap_data = dashboard["heatmap"]
+        funnel = dashboard["funnel"]
 
 except Exception as e:
     st.error(f"❌ Error al cargar métricas: {str(e)}")
@@ -135,12 +149,13 @@ with col_left:
 with col_right:
     st.markdown("### 📊 Distribución de Intents")
 
-    if intents:
-        df_dist = pd.DataFrame(intents)
+    # Same top 5 the summary already ranks server-side
+    if top_intents:
+        df_dist = pd.DataFrame(top_intents)
 
         # Create pie chart
         fig_pie = px.pie(
-            df_dist.head(5),
+            df_dist,
             values="count",
             names="intent",
             title="Top 5 Intents por Volumen",
@@ -158,7 +173,8 @@ st.markdown("---")
 # === TIMELINE ===
 st.markdown("### 📅 Timeline de Conversaciones (Últimos 30 días)")
 
-if timeline:
+# The API returns every day/hour (gap-filled with 0), so check for actual data
+if timeline and any(row['conversations'] for row in timeline):
     df_timeline = pd.DataFrame(timeline)
     df_timeline['date'] = pd.to_datetime(df_timeline['date'])
 
@@ -183,26 +199,12 @@ st.markdown("---")
 # === HEATMAP ===
 st.markdown("### 🔥 Heatmap de Uso por Hora")
 
-if heatmap_data:
-    # Prepare data for heatmap
-    df_heatmap = pd.DataFrame(heatmap_data)
-
-    # Create pivot table
-    pivot = df_heatmap.pivot_table(
-        values='count',
-        index='day',
-        columns='hour',
-        fill_value=0
-    )
-
-    # Reorder days
-    day_order = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    pivot = pivot.reindex([d for d in day_order if d in pivot.index])
-
+if heatmap_data and any(any(row) for row in heatmap_data['z']):
+    # The API already returns the 7x24 matrix (Monday first)
     fig_heatmap = go.Figure(data=go.Heatmap(
-        z=pivot.values,
-        x=[f"{h}:00" for h in range(24)],
-        y=pivot.index,
+        z=heatmap_data['z'],
+        x=[f"{h}:00" for h in heatmap_data['hours']],
+        y=heatmap_data['days'],
         colorscale='YlOrRd',
         hoverongaps=False
     ))
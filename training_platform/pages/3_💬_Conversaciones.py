@@ -6,14 +6,18 @@ import sys
 from pathlib import Path
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import json
-import pytz
+import html
+import tempfile
+from zoneinfo import ZoneInfo
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from utils.session import require_auth, get_current_user
-from utils.api_client import APIClient
+from utils.api_client import APIClient, init_worker_session
+from utils.annotation_helpers import fetch_export_intents
 
 # Page configuration
 st.set_page_config(
@@ -30,20 +34,188 @@ user = get_current_user()
 api_client = st.session_state.api_client
 
 # Guatemala timezone
-GUATEMALA_TZ = pytz.timezone('America/Guatemala')
+GUATEMALA_TZ = ZoneInfo('America/Guatemala')
+
+# Minimum text search length sent to the API
+MIN_SEARCH_LENGTH = 3
+
+# Table columns (API field names) and their display labels, in display order
+DISPLAY_COLUMNS = ["sender_id", "created_at", "message_count", "primary_intent", "avg_confidence", "last_message", "active"]
+DISPLAY_LABELS = ["Usuario", "Fecha", "Mensajes", "Intent Principal", "Confianza (%)", "Último Mensaje", "Activo"]
+# Compact dtypes for the table (instead of inferred object columns)
+DISPLAY_DTYPES = {
+    "sender_id": "string[pyarrow]",
+    "message_count": "int32",
+    "primary_intent": "category",
+    "avg_confidence": "float32",
+    "active": "bool"
+}
+
+# Page styling (summary metrics grid, chat bubbles), injected once at the top
+PAGE_CSS = """
+<style>
+.metrics-grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 1rem; margin-bottom: 1rem; }
+.metrics-grid .label { font-size: 0.875rem; opacity: 0.8; }
+.metrics-grid .value { font-size: 2.25rem; line-height: 1.4; }
+.chat-msg { padding: 0.6rem 0.9rem; border-radius: 0.5rem; margin-bottom: 0.75rem; max-width: 80%; }
+.chat-msg.user { background: rgba(28, 131, 225, 0.1); margin-right: auto; }
+.chat-msg.bot { background: rgba(33, 195, 84, 0.1); margin-left: auto; }
+.chat-msg .who { font-weight: 600; margin-bottom: 0.25rem; }
+.chat-msg .meta { font-size: 0.8rem; opacity: 0.7; margin-top: 0.25rem; }
+</style>
+"""
+
+# CSV exports are spooled in memory up to this size, then to a temp file
+CSV_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+# Background fetches (next page, annotation intents); results land in the
+# st.cache_data caches of the fetch functions
+@st.cache_resource
+def _get_prefetch_pool() -> ThreadPoolExecutor:
+    """One executor for the whole server process, not one per rerun"""
+    return ThreadPoolExecutor(max_workers=4, initializer=init_worker_session)
+
+
+_prefetch_pool = _get_prefetch_pool()
+
+
+def submit_prefetch(fn, *args):
+    """Run fn(client, *args) on the prefetch pool, using the worker's own session"""
+    return _prefetch_pool.submit(lambda: fn(api_client.for_worker(), *args))
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_intents(_api_client: APIClient):
+    """Fetch the intents for the filter dropdown (cached 5 minutes)"""
+    return _api_client._make_request("GET", "/api/v1/conversations/intents")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _today_gt():
+    """Today's date in Guatemala (cached 60s, shared by the date presets)"""
+    return datetime.now(GUATEMALA_TZ).date()
+
+
+@st.cache_data(ttl=60, max_entries=64, show_spinner=False)
+def fetch_conversations(_api_client: APIClient, username: str, params: tuple):
+    """
+    Fetch a page of conversations, cached 60s per (user, query params)
+
+    params is the sorted tuple of query parameter items so it is hashable;
+    going back to a page or to a previous filter state is served from memory.
+    """
+    return _api_client._make_request("GET", "/api/v1/conversations", params=dict(params))
+
+
+@st.cache_data(ttl=60, max_entries=16, show_spinner=False)
+def fetch_conversation_details(_api_client: APIClient, username: str, sender_ids: tuple):
+    """
+    Fetch the details of every conversation on a page in one request
+
+    Cached 60s per (user, page senders), so browsing several conversations
+    of the same page costs a single round trip.
+    """
+    return _api_client._make_request(
+        "GET",
+        "/api/v1/conversations/batch",
+        params={"sender_ids": ",".join(sender_ids)}
+    )
+
+
+def _message_text_html(msg: dict) -> str:
+    """Escaped message text; <br> instead of newlines since a blank line would end the HTML block"""
+    return html.escape(msg.get("text") or "").replace("\n", "<br>")
+
+
+def _render_user_html(msg: dict) -> str:
+    """Chat bubble for a user message, with intent/confidence/entities caption"""
+    intent = msg.get("intent", "N/A")
+    confidence = msg.get("confidence", 0)
+    entities = msg.get("entities", [])
+
+    caption_parts = [f"🎯 Intent: <code>{html.escape(str(intent))}</code>"]
+    if confidence:
+        caption_parts.append(f"Confidence: {confidence*100:.1f}%")
+    if entities:
+        try:
+            # RASA entities always carry entity/value
+            entities_str = ", ".join(f"{e['entity']}={e['value']}" for e in entities[:3])
+        except KeyError:
+            entities_str = ", ".join(f"{e.get('entity')}={e.get('value')}" for e in entities[:3])
+        caption_parts.append(f"Entities: <code>{html.escape(entities_str)}</code>")
+
+    return (
+        f"<div class='chat-msg user'><div class='who'>👤 Usuario</div>{_message_text_html(msg)}"
+        f"<div class='meta'>{' | '.join(caption_parts)}</div></div>"
+    )
+
+
+def _render_bot_html(msg: dict) -> str:
+    """Chat bubble for a bot message, with the action caption when present"""
+    action = ""
+    if msg.get("action"):
+        action = f"<div class='meta'>🤖 Acción: <code>{html.escape(msg['action'])}</code></div>"
+
+    return f"<div class='chat-msg bot'><div class='who'>🤖 Bot</div>{_message_text_html(msg)}{action}</div>"
+
+
+_MESSAGE_RENDERERS = {"user": _render_user_html, "bot": _render_bot_html}
+
+
+def render_messages_html(messages: list) -> str:
+    """
+    Build the chat history as a single HTML block
+
+    One st.markdown call per conversation instead of several widgets per
+    message keeps long conversations fast to render.
+    """
+    return "\n".join(
+        _MESSAGE_RENDERERS[msg["type"]](msg) for msg in messages if msg["type"] in _MESSAGE_RENDERERS
+    )
+
+
+@st.cache_data(ttl=600, max_entries=16, show_spinner="Generando archivo CSV...")
+def build_csv(_api_client: APIClient, username: str, date_from_iso: str, date_to_iso: str, intents_key: str) -> bytes:
+    """
+    Fetch the CSV export for a filter set, cached 10 minutes
+
+    Repeated downloads with the same filters are served from memory. The
+    response is streamed in chunks into a spooled file instead of being
+    buffered whole by requests.
+    """
+    export_params = {
+        "date_from": date_from_iso,
+        "date_to": date_to_iso
+    }
+    if intents_key:
+        export_params["intents"] = intents_key
+    with tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_MAX_SIZE) as spool:
+        _api_client.stream_to_file(
+            spool,
+            "GET",
+            "/api/v1/conversations/export/csv",
+            params=export_params
+        )
+        spool.seek(0)
+        return spool.read()
+
 
 # Initialize session state
 if "current_page" not in st.session_state:
     st.session_state.current_page = 1
+if "page_cursors" not in st.session_state:
+    # Keyset cursors from the API (next_cursor), keyed by (filters, page)
+    st.session_state.page_cursors = {}
 
 # Title
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 st.title("💬 Historial de Conversaciones")
 st.markdown("Visualiza, filtra y analiza todas las conversaciones del chatbot")
 st.markdown("---")
 
 # === LOAD AVAILABLE INTENTS ===
 try:
-    available_intents = api_client._make_request("GET", "/api/v1/conversations/intents")
+    available_intents = load_intents(api_client)
 except Exception as e:
     st.error(f"❌ Error al cargar intents: {str(e)}")
     available_intents = []
@@ -68,21 +240,21 @@ with st.sidebar:
     )
 
     # Calculate date range based on preset
-    now_guatemala = datetime.now(GUATEMALA_TZ)
+    today_gt = _today_gt()
 
     if date_preset == "personalizado":
         col_date1, col_date2 = st.columns(2)
         with col_date1:
             date_from = st.date_input(
                 "Desde",
-                value=now_guatemala.date() - timedelta(days=7),
-                max_value=now_guatemala.date()
+                value=today_gt - timedelta(days=7),
+                max_value=today_gt
             )
         with col_date2:
             date_to = st.date_input(
                 "Hasta",
-                value=now_guatemala.date(),
-                max_value=now_guatemala.date()
+                value=today_gt,
+                max_value=today_gt
             )
     else:
         days_map = {
@@ -92,63 +264,82 @@ with st.sidebar:
             "90_dias": 90
         }
         days = days_map[date_preset]
-        date_from = (now_guatemala - timedelta(days=days)).date()
-        date_to = now_guatemala.date()
+        date_from = today_gt - timedelta(days=days)
+        date_to = today_gt
 
         st.caption(f"📅 {date_from.strftime('%Y-%m-%d')} hasta {date_to.strftime('%Y-%m-%d')}")
 
-    # Intent filter
-    st.markdown("#### Intent")
-    intent_filter = st.multiselect(
-        "Filtrar por intent",
-        options=available_intents,
-        default=None,
-        help="Deja vacío para ver todos los intents"
-    )
+    # The remaining filters only apply on submit, so typing in the search
+    # boxes or moving the slider doesn't query the API on every change.
+    # The date preset stays outside: it toggles the custom date inputs.
+    with st.form("filters", border=False):
+        # Intent filter
+        st.markdown("#### Intent")
+        intent_filter = st.multiselect(
+            "Filtrar por intent",
+            options=available_intents,
+            default=None,
+            help="Deja vacío para ver todos los intents"
+        )
 
-    # Confidence filter
-    st.markdown("#### Confianza")
-    confidence_min = st.slider(
-        "Confianza mínima (%)",
-        min_value=0,
-        max_value=100,
-        value=0,
-        step=5,
-        help="Filtra conversaciones con confianza mayor o igual al valor seleccionado"
-    )
+        # Confidence filter
+        st.markdown("#### Confianza")
+        confidence_min = st.slider(
+            "Confianza mínima (%)",
+            min_value=0,
+            max_value=100,
+            value=0,
+            step=5,
+            help="Filtra conversaciones con confianza mayor o igual al valor seleccionado"
+        )
 
-    # User search
-    st.markdown("#### Usuario")
-    user_search = st.text_input(
-        "Buscar por sender_id",
-        placeholder="Ej: 50123456789",
-        help="Buscar conversaciones de un usuario específico"
-    )
+        # User search
+        st.markdown("#### Usuario")
+        user_search = st.text_input(
+            "Buscar por sender_id",
+            placeholder="Ej: 50123456789",
+            help="Buscar conversaciones de un usuario específico"
+        )
 
-    # Text search
-    st.markdown("#### Búsqueda en Mensajes")
-    text_search = st.text_input(
-        "Buscar texto",
-        placeholder="Buscar en mensajes...",
-        help="Busca texto en los mensajes del usuario"
-    )
+        # Text search
+        st.markdown("#### Búsqueda en Mensajes")
+        text_search = st.text_input(
+            "Buscar texto",
+            placeholder="Buscar en mensajes...",
+            help="Busca texto en los mensajes del usuario"
+        )
 
-    # Pagination
-    st.markdown("---")
-    st.markdown("#### Paginación")
-    items_per_page = st.selectbox(
-        "Items por página",
-        options=[25, 50, 100, 200],
-        index=1  # Default: 50
-    )
+        # Only query once the term is meaningful: surrounding spaces don't
+        # change the results and 1-2 characters match almost everything
+        text_search_effective = text_search.strip()
+        if 0 < len(text_search_effective) < MIN_SEARCH_LENGTH:
+            st.caption(f"✏️ Escribe al menos {MIN_SEARCH_LENGTH} caracteres para buscar")
+            text_search_effective = ""
+
+        # Pagination
+        st.markdown("---")
+        st.markdown("#### Paginación")
+        items_per_page = st.selectbox(
+            "Items por página",
+            options=[25, 50, 100, 200],
+            index=1  # Default: 50
+        )
+
+        if st.form_submit_button("🔎 Aplicar filtros", use_container_width=True, type="primary"):
+            st.session_state.current_page = 1
 
     st.markdown("---")
 
     # Action buttons
     if st.button("🔄 Actualizar", use_container_width=True):
+        load_intents.clear()
+        fetch_conversations.clear()
+        fetch_conversation_details.clear()
+        st.session_state.pop("_last_conversations_data", None)
         st.rerun()
 
     if st.button("🗑️ Limpiar Filtros", use_container_width=True):
+        load_intents.clear()
         st.session_state.current_page = 1
         st.rerun()
 
@@ -161,88 +352,109 @@ try:
             "date_to": date_to.isoformat(),
             "confidence_min": confidence_min / 100,  # Convert to 0-1 range
             "page": st.session_state.current_page,
-            "limit": items_per_page
+            "limit": items_per_page,
+            # Only the columns shown in the table
+            "fields": ",".join(DISPLAY_COLUMNS)
         }
 
         if intent_filter:
-            params["intents"] = ",".join(intent_filter)
+            # Sorted so the same selection always maps to the same cache entry
+            params["intents"] = ",".join(sorted(intent_filter))
 
         if user_search:
             params["sender_id"] = user_search
 
-        if text_search:
-            params["search"] = text_search
+        if text_search_effective:
+            params["search"] = text_search_effective
 
-        # Fetch conversations from API
-        conversations_data = api_client._make_request("GET", "/api/v1/conversations", params=params)
+        # Use the cursor handed out with the previous page when we have one
+        filters_key = tuple(sorted((k, str(v)) for k, v in params.items() if k != "page"))
+        # Cursors from other filter sets can't be reused; drop them
+        st.session_state.page_cursors = {
+            key: value for key, value in st.session_state.page_cursors.items() if key[0] == filters_key
+        }
+        cursor = st.session_state.page_cursors.get((filters_key, st.session_state.current_page))
+        if cursor:
+            params["cursor"] = cursor
+
+        # Reruns with the same query (e.g. detail view interactions) reuse the
+        # last result directly; otherwise go through the cached fetch
+        params_key = tuple(sorted(params.items()))
+        last_key, last_data = st.session_state.get("_last_conversations_data", (None, None))
+        if last_key == params_key:
+            conversations_data = last_data
+        else:
+            conversations_data = fetch_conversations(api_client, user['username'], params_key)
+            st.session_state._last_conversations_data = (params_key, conversations_data)
+
+        if conversations_data and conversations_data.get("next_cursor"):
+            st.session_state.page_cursors[(filters_key, conversations_data["page"] + 1)] = conversations_data["next_cursor"]
+
+        # Speculatively fetch the next page with the same params the next
+        # rerun will build, so "Siguiente" is served from cache
+        if conversations_data and conversations_data["page"] < conversations_data["pages"]:
+            next_params = dict(params, page=conversations_data["page"] + 1)
+            if conversations_data.get("next_cursor"):
+                next_params["cursor"] = conversations_data["next_cursor"]
+            submit_prefetch(fetch_conversations, user['username'], tuple(sorted(next_params.items())))
 
 except Exception as e:
     st.error(f"❌ Error al cargar conversaciones: {str(e)}")
     st.info("💡 Asegúrate de que el servidor API esté corriendo correctamente.")
     st.stop()
 
+# Current page as a DataFrame (used by the summary and the table)
+df_conversations = pd.DataFrame.from_records(
+    conversations_data.get("items", []), columns=DISPLAY_COLUMNS
+).astype(DISPLAY_DTYPES, errors="ignore")
+
 # === STATISTICS SUMMARY ===
 if conversations_data.get("total", 0) > 0:
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.metric(
-            label="Total Conversaciones",
-            value=conversations_data["total"],
-            help="Total de conversaciones encontradas con los filtros aplicados"
-        )
-
-    with col2:
-        st.metric(
-            label="Página Actual",
-            value=f"{conversations_data['page']} / {conversations_data['pages']}",
-            help="Página actual de resultados"
-        )
-
-    with col3:
-        # Calculate average confidence from current page
-        items = conversations_data.get("items", [])
-        if items:
-            avg_conf = sum(item.get("avg_confidence", 0) for item in items) / len(items)
-            st.metric(
-                label="Confianza Promedio",
-                value=f"{avg_conf:.1f}%",
-                help="Confianza promedio en esta página"
-            )
-        else:
-            st.metric(label="Confianza Promedio", value="N/A")
-
-    with col4:
-        # Count unique senders in current page
-        unique_senders = len(set(item.get("sender_id") for item in items))
-        st.metric(
-            label="Usuarios Únicos",
-            value=unique_senders,
-            help="Usuarios únicos en los resultados actuales"
-        )
+    # Average confidence and unique senders of the current page
+    if not df_conversations.empty:
+        # sum() skips NaN, so this averages missing confidences as 0 without a filled copy
+        avg_conf_str = f"{df_conversations['avg_confidence'].sum() / len(df_conversations):.1f}%"
+        unique_senders = df_conversations["sender_id"].nunique()
+    else:
+        avg_conf_str = "N/A"
+        unique_senders = 0
+
+    # (label, value, tooltip); one HTML block instead of four st.metric widgets
+    summary_metrics = [
+        ("Total Conversaciones", conversations_data["total"], "Total de conversaciones encontradas con los filtros aplicados"),
+        ("Página Actual", f"{conversations_data['page']} / {conversations_data['pages']}", "Página actual de resultados"),
+        ("Confianza Promedio", avg_conf_str, "Confianza promedio en esta página"),
+        ("Usuarios Únicos", unique_senders, "Usuarios únicos en los resultados actuales"),
+    ]
+    st.markdown(
+        "<div class='metrics-grid'>" + "".join(
+            f"<div title='{help_text}'><div class='label'>{label}</div><div class='value'>{value}</div></div>"
+            for label, value, help_text in summary_metrics
+        ) + "</div>",
+        unsafe_allow_html=True
+    )
 
     st.markdown("---")
 
 # === CONVERSATIONS TABLE ===
 st.markdown("### 📋 Resultados")
 
-if conversations_data.get("total", 0) > 0:
-    # Create DataFrame
-    items = conversations_data["items"]
-    df_conversations = pd.DataFrame(items)
 
+@st.fragment
+def render_results(conversations_data, df_conversations, date_from, date_to, intent_filter):
+    """
+    Render the table, pagination, detail view and export
+
+    Runs as a fragment: selecting a conversation or using its action
+    buttons reruns only this block, not the filters and the list fetch.
+    Pagination still triggers a full rerun (st.rerun) to fetch the page.
+    """
     # Format columns
     if not df_conversations.empty:
-        # Rename columns for display
-        df_display = df_conversations.rename(columns={
-            "sender_id": "Usuario",
-            "created_at": "Fecha",
-            "message_count": "Mensajes",
-            "primary_intent": "Intent Principal",
-            "avg_confidence": "Confianza (%)",
-            "last_message": "Último Mensaje",
-            "active": "Activo"
-        })
+        # Select and label the display columns without copying
+        df_display = df_conversations.reindex(columns=DISPLAY_COLUMNS, copy=False).set_axis(
+            DISPLAY_LABELS, axis=1, copy=False
+        )
 
         # Show interactive table
         st.dataframe(
@@ -292,15 +504,28 @@ if conversations_data.get("total", 0) > 0:
 
         selected_sender = st.selectbox(
             "Selecciona una conversación para ver detalles",
-            options=[""] + df_conversations["sender_id"].tolist(),
+            options=("",) + tuple(df_conversations["sender_id"].values),
             format_func=lambda x: "-- Selecciona un usuario --" if x == "" else x
         )
 
         if selected_sender:
             with st.spinner("Cargando detalles..."):
                 try:
-                    # Fetch detailed conversation from API
-                    conversation_detail = api_client._make_request(
+                    # The annotation form needs the export intents; load them
+                    # concurrently with the details instead of after "Anotar"
+                    submit_prefetch(fetch_export_intents)
+
+                    # Details for the whole page come in one batched request
+                    try:
+                        page_details = fetch_conversation_details(
+                            api_client,
+                            user['username'],
+                            tuple(df_conversations["sender_id"].values)
+                        )
+                    except Exception:
+                        page_details = {}  # Batch endpoint unavailable: fetch just this one
+
+                    conversation_detail = page_details.get(selected_sender) or api_client._make_request(
                         "GET",
                         f"/api/v1/conversations/{selected_sender}"
                     )
@@ -324,38 +549,15 @@ if conversations_data.get("total", 0) > 0:
                     st.markdown("#### 💬 Historial de Mensajes")
 
                     messages = conversation_detail.get("messages", [])
-                    for msg in messages:
-                        if msg["type"] == "user":
-                            # User message
-                            col1, col2 = st.columns([1, 4])
-                            with col1:
-                                st.markdown("**👤 Usuario**")
-                            with col2:
-                                st.info(msg.get("text", ""))
-                                intent = msg.get("intent", "N/A")
-                                confidence = msg.get("confidence", 0)
-                                entities = msg.get("entities", [])
-
-                                caption_parts = [f"🎯 Intent: `{intent}`"]
-                                if confidence:
-                                    caption_parts.append(f"Confidence: {confidence*100:.1f}%")
-                                if entities:
-                                    entities_str = ", ".join([f"{e.get('entity')}={e.get('value')}" for e in entities[:3]])
-                                    caption_parts.append(f"Entities: {entities_str}")
-
-                                st.caption(" | ".join(caption_parts))
-
-                        elif msg["type"] == "bot":
-                            # Bot message
-                            col3, col4 = st.columns([4, 1])
-                            with col3:
-                                st.success(msg.get("text", ""))
-                                if msg.get("action"):
-                                    st.caption(f"🤖 Acción: `{msg['action']}`")
-                            with col4:
-                                st.markdown("**🤖 Bot**")
-
-                        st.markdown("")  # Spacing
+
+                    # Keep the rendered HTML of the open conversation so reruns
+                    # (action buttons, fragment reruns) don't rebuild it
+                    html_key = (selected_sender, len(messages))
+                    cached_html = st.session_state.get("_detail_html")
+                    if not cached_html or cached_html[0] != html_key:
+                        cached_html = (html_key, render_messages_html(messages))
+                        st.session_state._detail_html = cached_html
+                    st.markdown(cached_html[1], unsafe_allow_html=True)
 
                     # Action buttons
                     st.markdown("---")
@@ -397,44 +599,35 @@ if conversations_data.get("total", 0) > 0:
         col_export1, col_export2 = st.columns(2)
 
         with col_export1:
-            if st.button("📄 Exportar a CSV", use_container_width=True):
-                try:
-                    # Build export params with filters
-                    export_params = {
-                        "date_from": date_from.isoformat(),
-                        "date_to": date_to.isoformat()
-                    }
-                    if intent_filter:
-                        export_params["intents"] = ",".join(intent_filter)
-
-                    # Make authenticated request to download CSV
-                    with st.spinner("Generando archivo CSV..."):
-                        csv_data = api_client._make_request(
-                            "GET",
-                            "/api/v1/conversations/export/csv",
-                            params=export_params,
-                            return_response=True  # Get raw response
-                        )
+            try:
+                csv_data = build_csv(
+                    api_client,
+                    user['username'],
+                    date_from.isoformat(),
+                    date_to.isoformat(),
+                    ",".join(sorted(intent_filter)) if intent_filter else ""
+                )
 
-                        # Provide download button
-                        filename = f"conversations_{date_from.isoformat()}_{date_to.isoformat()}.csv"
-                        st.download_button(
-                            label="⬇️ Descargar CSV",
-                            data=csv_data,
-                            file_name=filename,
-                            mime="text/csv",
-                            use_container_width=True
-                        )
-                        st.success("✅ Archivo CSV generado correctamente")
+                filename = f"conversations_{date_from.isoformat()}_{date_to.isoformat()}.csv"
+                st.download_button(
+                    label="📄 Exportar a CSV",
+                    data=csv_data,
+                    file_name=filename,
+                    mime="text/csv",
+                    use_container_width=True
+                )
 
-                except Exception as e:
-                    st.error(f"❌ Error al generar exportación: {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error al generar exportación: {str(e)}")
 
         with col_export2:
             if st.button("📊 Exportar a Excel", use_container_width=True):
                 st.info("🚧 Exportación a Excel en desarrollo")
                 st.caption("Por ahora, puedes usar CSV y convertirlo en Excel")
 
+
+if conversations_data.get("total", 0) > 0:
+    render_results(conversations_data, df_conversations, date_from, date_to, intent_filter)
 else:
     # No results found
     st.info("🔍 No se encontraron conversaciones con los filtros aplicados.")
@@ -455,14 +648,22 @@ if st.session_state.get("show_annotation_modal"):
     st.subheader("✍️ Crear Anotación")
     st.markdown(f"**Conversación:** `{conversation_data.get('sender_id')}`")
 
-    # Let user select which message to annotate
-    user_messages = [msg for msg in messages if msg["type"] == "user"]
+    # Let user select which message to annotate. The user messages and their
+    # labels are built once per conversation and reused across reruns
+    labels_key = (conversation_data.get("sender_id"), len(messages))
+    cached_labels = st.session_state.get("_annotation_message_labels")
+    if not cached_labels or cached_labels[0] != labels_key:
+        user_messages = [msg for msg in messages if msg["type"] == "user"]
+        labels = [f"Mensaje {i+1}: {(msg.get('text') or '')[:60]}..." for i, msg in enumerate(user_messages)]
+        cached_labels = (labels_key, user_messages, labels)
+        st.session_state._annotation_message_labels = cached_labels
+    _, user_messages, labels = cached_labels
 
     if user_messages:
         selected_message_idx = st.selectbox(
             "Selecciona el mensaje a anotar",
-            options=range(len(user_messages)),
-            format_func=lambda i: f"Mensaje {i+1}: {user_messages[i].get('text', '')[:60]}..."
+            options=range(len(labels)),
+            format_func=labels.__getitem__
         )
 
         selected_message = user_messages[selected_message_idx]
@@ -480,25 +681,20 @@ if st.session_state.get("show_annotation_modal"):
 
                 # Get available intents
                 try:
-                    intents_response = api_client._make_request("GET", "/api/v1/export/intents")
-                    # API returns {"intents": [...], "total": X}, extract the list
-                    if isinstance(intents_response, dict) and "intents" in intents_response:
-                        available_intents = intents_response["intents"]
-                    elif isinstance(intents_response, list):
-                        available_intents = intents_response
-                    else:
-                        available_intents = []
+                    available_intents = fetch_export_intents(api_client)
                 except Exception as e:
                     st.warning(f"⚠️ No se pudieron cargar intents: {str(e)}")
                     available_intents = []
 
+            # Position of each intent, for the selectbox default
+            intent_index = {name: i for i, name in enumerate(available_intents)}
+
             with col2:
                 st.markdown("**Corrección:**")
                 corrected_intent = st.selectbox(
                     "Intent Corregido *",
                     options=available_intents,
-                    index=available_intents.index(selected_message.get("intent", ""))
-                        if selected_message.get("intent") in available_intents else 0
+                    index=intent_index.get(selected_message.get("intent"), 0)
                 )
 
             # Annotation type
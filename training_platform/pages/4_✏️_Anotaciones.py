@@ -54,12 +54,28 @@ api_client = st.session_state.api_client
 # FUNCIONES AUXILIARES
 # ============================================
 
+@st.cache_data(ttl=30, show_spinner="Cargando estadísticas...")
+def fetch_annotation_stats(_api_client, username: str) -> Dict:
+    """Estadísticas de anotaciones (cache de 30s por usuario)."""
+    return _api_client._make_request("GET", "/api/v1/annotations/stats")
+
+
+@st.cache_data(ttl=30, max_entries=64, show_spinner="Cargando anotaciones...")
+def fetch_annotations(_api_client, username: str, params: tuple) -> Dict:
+    """Página de anotaciones (cache de 30s por usuario y filtros)."""
+    return _api_client._make_request("GET", "/api/v1/annotations", params=dict(params))
+
+
+def invalidate_annotation_cache() -> None:
+    """Descarta listado y estadísticas cacheados tras crear/editar/aprobar/eliminar."""
+    fetch_annotations.clear()
+    fetch_annotation_stats.clear()
+
+
 def load_annotation_stats() -> Optional[Dict]:
     """Carga estadísticas de anotaciones desde el API."""
     try:
-        with st.spinner("Cargando estadísticas..."):
-            response = api_client._make_request("GET", "/api/v1/annotations/stats")
-            return response
+        return fetch_annotation_stats(api_client, user["username"])
     except Exception as e:
         st.error(f"Error al cargar estadísticas: {str(e)}")
         return None
@@ -89,13 +105,7 @@ def load_annotations(
         if approved_by:
             params["approved_by"] = approved_by
 
-        with st.spinner("Cargando anotaciones..."):
-            response = api_client._make_request(
-                "GET",
-                "/api/v1/annotations",
-                params=params
-            )
-            return response
+        return fetch_annotations(api_client, user["username"], tuple(sorted(params.items())))
     except Exception as e:
         st.error(f"Error al cargar anotaciones: {str(e)}")
         return None
@@ -111,6 +121,7 @@ def create_annotation(data: Dict) -> bool:
                 json=data
             )
             if response:
+                invalidate_annotation_cache()
                 st.success(f"✅ Anotación creada exitosamente (ID: {response.get('id')})")
                 return True
     except Exception as e:
@@ -128,6 +139,7 @@ def update_annotation(annotation_id: int, data: Dict) -> bool:
                 json=data
             )
             if response:
+                invalidate_annotation_cache()
                 st.success("✅ Anotación actualizada exitosamente")
                 return True
     except Exception as e:
@@ -149,6 +161,7 @@ def approve_annotation(annotation_id: int, approved: bool, rejection_reason: str
                 json=data
             )
             if response:
+                invalidate_annotation_cache()
                 action = "aprobada" if approved else "rechazada"
                 st.success(f"✅ Anotación {action} exitosamente")
                 return True
@@ -165,6 +178,7 @@ def delete_annotation(annotation_id: int) -> bool:
                 "DELETE",
                 f"/api/v1/annotations/{annotation_id}"
             )
+            invalidate_annotation_cache()
             st.success("✅ Anotación eliminada exitosamente")
             return True
     except Exception as e:
@@ -497,8 +511,9 @@ if st.session_state.get("show_create_modal") or st.session_state.get("show_edit_
                 corrected_intent = st.selectbox(
                     "Intent Corregido *",
                     options=intents,
-                    index=intents.index(annotation_to_edit.get("corrected_intent"))
-                        if annotation_to_edit and annotation_to_edit.get("corrected_intent") in intents else 0
+                    index={name: i for i, name in enumerate(intents)}.get(
+                        annotation_to_edit.get("corrected_intent") if annotation_to_edit else None, 0
+                    )
                 )
 
                 # Confianza Original - Solo lectura
@@ -22,6 +22,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.session import require_auth, get_current_user
+from utils.annotation_helpers import fetch_export_intents
 
 
 # ============================================
@@ -63,10 +64,9 @@ if not has_export_permission(user):
 # ============================================
 
 def load_intents() -> list:
-    """Carga lista de intents disponibles."""
+    """Carga lista de intents disponibles (cache de 5 minutos)."""
     try:
-        response = api_client._make_request("GET", "/api/v1/export/intents")
-        return response.get("intents", []) if isinstance(response, dict) else response
+        return fetch_export_intents(api_client)
     except Exception as e:
         st.error(f"Error al cargar intents: {str(e)}")
         return []
@@ -220,6 +220,25 @@ def validate_entity_spans(
     return is_valid, errors
 
 
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_export_intents(_api_client) -> List[str]:
+    """
+    Obtiene los intents de /api/v1/export/intents (cache de 5 minutos).
+
+    Args:
+        _api_client: Cliente API configurado (no se usa como clave de cache)
+
+    Returns:
+        Lista de nombres de intents
+    """
+    response = _api_client._make_request("GET", "/api/v1/export/intents")
+
+    # El API retorna {"intents": [...], "total": X}
+    if isinstance(response, dict):
+        return response.get("intents") or []
+    return response or []
+
+
 def get_intent_suggestions(api_client, query: str = "") -> List[str]:
     """
     Obtiene lista de intents disponibles desde el API.
@@ -232,11 +251,9 @@ def get_intent_suggestions(api_client, query: str = "") -> List[str]:
         Lista de nombres de intents
     """
     try:
-        response = api_client._make_request("GET", "/api/v1/export/intents")
-
-        if response and response.get("intents"):
-            intents = response["intents"]
+        intents = fetch_export_intents(api_client)
 
+        if intents:
             # Filtrar por query si se proporciona
             if query:
                 query_lower = query.lower()
@@ -1,9 +1,40 @@
 """
 API Client for Training Platform
 """
+import orjson
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Any, BinaryIO, Dict, Optional
+from urllib3.util.retry import Retry
+import copy
 import os
+import threading
+
+# Sessions of background worker threads (see init_worker_session)
+_worker = threading.local()
+
+
+def create_session() -> requests.Session:
+    """
+    Build a keep-alive session with a pooled adapter
+
+    Retry only covers connection errors and idempotent methods.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.1)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+def init_worker_session() -> None:
+    """ThreadPoolExecutor initializer: give the worker thread its own session"""
+    _worker.session = create_session()
 
 
 class APIClient:
@@ -13,9 +44,25 @@ class APIClient:
         self.base_url = base_url or os.getenv("API_URL", "http://api-server:8000")
         self.token: Optional[str] = None
 
+        # One keep-alive connection pool per client (the client lives in
+        # st.session_state, so it survives reruns)
+        self.session = create_session()
+
+    def for_worker(self) -> "APIClient":
+        """
+        Copy of this client bound to the calling worker thread's session
+
+        requests.Session isn't thread-safe, so background jobs must not use
+        the script thread's session. Only valid on threads started with
+        init_worker_session as initializer.
+        """
+        client = copy.copy(self)
+        client.session = _worker.session
+        return client
+
     def _get_headers(self) -> Dict[str, str]:
-        """Get headers with authorization token if available"""
-        headers = {"Content-Type": "application/json"}
+        """Get headers with authorization token if available (Content-Type is a session default)"""
+        headers = {}
         if self.token:
             headers["Authorization"] = f"Bearer {self.token}"
         return headers
@@ -27,10 +74,9 @@ class APIClient:
         Returns:
             dict: Response containing access_token and user info
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/api/v1/auth/login",
-            json={"username": username, "password": password},
-            headers={"Content-Type": "application/json"}
+            json={"username": username, "password": password}
         )
 
         if response.status_code == 200:
@@ -47,7 +93,7 @@ class APIClient:
         Returns:
             dict: User information
         """
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/api/v1/auth/me",
             headers=self._get_headers()
         )
@@ -60,7 +106,7 @@ class APIClient:
     def logout(self) -> None:
         """Logout from the platform"""
         if self.token:
-            requests.post(
+            self.session.post(
                 f"{self.base_url}/api/v1/auth/logout",
                 headers=self._get_headers()
             )
@@ -74,9 +120,9 @@ class APIClient:
             bool: True if API is healthy, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=2)
+            response = self.session.get(f"{self.base_url}/health", timeout=2)
             return response.status_code == 200
-        except:
+        except requests.RequestException:
             return False
 
     def _make_request(self, method: str, endpoint: str, return_response: bool = False, **kwargs) -> Any:
@@ -95,7 +141,7 @@ class APIClient:
         url = f"{self.base_url}{endpoint}"
         headers = self._get_headers()
 
-        response = requests.request(
+        response = self.session.request(
             method=method,
             url=url,
             headers=headers,
@@ -106,6 +152,38 @@ class APIClient:
             if return_response:
                 return response.content  # Return raw bytes for files
             else:
-                return response.json()  # Return JSON for normal responses
+                return orjson.loads(response.content)  # Return JSON for normal responses
         else:
             raise Exception(f"API request failed: {response.status_code} - {response.text}")
+
+    def stream_to_file(self, fileobj: BinaryIO, method: str, endpoint: str, chunk_size: int = 64 * 1024, **kwargs) -> int:
+        """
+        Stream a (file download) response body into a file object
+
+        Args:
+            fileobj: Binary file object to write to
+            method: HTTP method
+            endpoint: API endpoint path
+            chunk_size: Bytes read per chunk
+            **kwargs: Additional arguments for requests
+
+        Returns:
+            int: Number of bytes written
+        """
+        url = f"{self.base_url}{endpoint}"
+
+        with self.session.request(
+            method=method,
+            url=url,
+            headers=self._get_headers(),
+            stream=True,
+            **kwargs
+        ) as response:
+            if response.status_code not in [200, 201]:
+                raise Exception(f"API request failed: {response.status_code} - {response.text}")
+
+            written = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                fileobj.write(chunk)
+                written += len(chunk)
+            return written